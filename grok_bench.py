@@ -0,0 +1,505 @@
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import parse_qs, urlparse
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from grok_interface import GrokInterface, DOM_SIZE_SCRIPT
+from grok_fake import FakeDriver
+from grok_metrics import Metrics
+
+# Local stand-in for the chat page. It reproduces the parts of the DOM that
+# GrokInterface relies on. Once the Submit button is clicked it fetches the
+# answer from the stand-in backend, which streams it as chunked
+# newline-delimited JSON like the real site, and renders it token by token.
+# Query parameters control the response:
+#   paragraphs - number of paragraphs in the response
+#   words      - words per paragraph
+#   code       - number of code blocks, one after each of the first paragraphs
+#   interval   - milliseconds it takes to stream one paragraph
+#   rate       - tokens per second, overrides interval
+#   assets     - number of heavy images, fonts and videos the page loads
+STAND_IN_PAGE = """<!DOCTYPE html>
+<html>
+<head><title>Grok stand-in</title></head>
+<body>
+<div id="chat"></div>
+<textarea class="bg-transparent"></textarea>
+<button aria-label="Submit" onclick="respond()">Submit</button>
+<script>
+const params = new URLSearchParams(location.search);
+const assets = parseInt(params.get('assets') || '0');
+
+// Heavy subresources of the kind lean mode blocks
+for (let i = 0; i < assets; i++) {
+    const img = document.createElement('img');
+    img.src = '/asset/image' + i + '.png';
+    document.body.appendChild(img);
+    const style = document.createElement('style');
+    style.textContent = "@font-face { font-family: f" + i + "; src: url('/asset/font" + i + ".woff2'); } " +
+                        "#chat { font-family: f" + i + "; }";
+    document.head.appendChild(style);
+    const video = document.createElement('video');
+    video.preload = 'auto';
+    video.src = '/asset/clip' + i + '.mp4';
+    document.body.appendChild(video);
+}
+
+function bubble(extraClass) {
+    const group = document.createElement('div');
+    group.className = 'group';
+    const div = document.createElement('div');
+    div.className = 'message-bubble' + (extraClass ? ' ' + extraClass : '');
+    group.appendChild(div);
+    document.getElementById('chat').appendChild(group);
+    return div;
+}
+
+// A code block like the real page's: language label, then pre > code
+function codeBlock(language) {
+    const block = document.createElement('div');
+    block.className = 'not-prose';
+    const label = document.createElement('span');
+    label.className = 'font-mono';
+    label.textContent = language;
+    const pre = document.createElement('pre');
+    const code = document.createElement('code');
+    pre.appendChild(code);
+    block.appendChild(label);
+    block.appendChild(pre);
+    return {block: block, code: code};
+}
+
+// Streams the answer from the local backend the way the real page does and
+// renders it token by token; a blank-line token starts a new paragraph and
+// a paragraph opening with a ``` fence is a code block.
+async function respond() {
+    const textarea = document.querySelector('textarea');
+    const prompt = textarea.value;
+    bubble('bg-foreground').textContent = prompt;
+    textarea.value = '';
+
+    const response = bubble('');
+    const reply = await fetch('/rest/app-chat/conversations/new' + location.search,
+                              {method: 'POST', body: JSON.stringify({message: prompt})});
+    const reader = reply.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let paragraph = null;
+    while (true) {
+        const {done, value} = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, {stream: true});
+        const lines = buffer.split('\\n');
+        buffer = lines.pop();
+        for (const line of lines) {
+            if (!line.trim()) continue;
+            const token = JSON.parse(line).result.response.token;
+            if (!token) continue;
+            if (token === '\\n\\n') {
+                paragraph = null;
+                continue;
+            }
+            if (!paragraph) {
+                if (token.startsWith('```')) {
+                    const code = codeBlock(token.slice(3).trim());
+                    response.appendChild(code.block);
+                    paragraph = code.code;
+                    continue;
+                }
+                paragraph = document.createElement('p');
+                response.appendChild(paragraph);
+            }
+            if (paragraph.tagName === 'CODE' && token === '\\n```') continue;
+            paragraph.textContent += token;
+        }
+    }
+
+    const bar = document.createElement('div');
+    bar.className = 'flex items-center gap-[2px] w-max';
+    for (let i = 0; i < 5; i++) {
+        bar.appendChild(document.createElement('button'));
+    }
+    response.parentElement.appendChild(bar);
+}
+</script>
+</body>
+</html>
+"""
+
+
+ASSET_SIZE = 512 * 1024  # bytes per heavy asset
+ASSET_DELAY = 0.05  # seconds of simulated network latency per asset
+ASSET_TYPES = {".png": "image/png", ".woff2": "font/woff2", ".mp4": "video/mp4"}
+LOREM_WORDS = "lorem ipsum dolor sit amet".split()
+CODE_LINES = ["total = 0", "for i in range(10):", "    total += i * i", "print(total)"]
+
+
+def response_events(paragraphs, interval, words=40, code=0, rate=None):
+    """Yield (delay, event) pairs for a streamed answer in Grok's newline-delimited JSON format."""
+    delay = 1 / rate if rate else interval / 1000 / (words + 1)
+
+    def token(text):
+        return delay, {"result": {"response": {"token": text, "isThinking": False}}}
+
+    for i in range(paragraphs):
+        if i:
+            yield token("\n\n")
+        yield token(f"Paragraph {i}:")
+        for j in range(words):
+            yield token(" " + LOREM_WORDS[j % len(LOREM_WORDS)])
+        if i < code:
+            yield token("\n\n")
+            yield token("```python\n")
+            for j, line in enumerate(CODE_LINES):
+                yield token(line + ("\n" if j < len(CODE_LINES) - 1 else ""))
+            yield token("\n```")
+    yield 0, {"result": {"response": {"token": "", "isSoftStop": True}}}
+
+
+def stand_in_events(query, message=None):
+    """Response events for the stand-in page's query parameters, given as a dict of strings."""
+    rate = query.get("rate")
+    return response_events(int(query.get("paragraphs", 20)), int(query.get("interval", 100)),
+                           words=int(query.get("words", 40)), code=int(query.get("code", 0)),
+                           rate=float(rate) if rate else None)
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    # Chunked transfer encoding needs HTTP/1.1
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        query = {key: values[0] for key, values in parse_qs(urlparse(self.path).query).items()}
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for delay, event in stand_in_events(query):
+            time.sleep(delay)
+            line = (json.dumps(event) + "\n").encode()
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+    def do_GET(self):
+        if self.path.startswith("/asset/"):
+            time.sleep(ASSET_DELAY)
+            body = bytes(ASSET_SIZE)
+            content_type = ASSET_TYPES.get(os.path.splitext(self.path)[1], "application/octet-stream")
+        else:
+            body = STAND_IN_PAGE.encode()
+            content_type = "text/html; charset=utf-8"
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server():
+    """Serve the stand-in page on a free local port from a background thread."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def count_round_trips(driver):
+    """Wrap the driver's script calls so that every WebDriver round trip is counted."""
+    counter = {"calls": 0}
+    for name in ("execute_script", "execute_async_script"):
+        original = getattr(driver, name)
+
+        def counted(*args, _original=original):
+            counter["calls"] += 1
+            return _original(*args)
+        setattr(driver, name, counted)
+    return counter
+
+
+def browser_cpu(driver):
+    """CPU seconds used so far by the Chrome processes behind a driver, or None without psutil or Chrome."""
+    try:
+        import psutil
+    except ImportError:
+        return None
+    service = getattr(driver, "service", None)
+    if service is None:
+        return None
+    total = 0.0
+    for process in psutil.Process(service.process.pid).children(recursive=True):
+        try:
+            times = process.cpu_times()
+        except psutil.NoSuchProcess:
+            continue
+        total += times.user + times.system
+    return total
+
+
+async def run_once(driver, counter, url, receive_mode):
+    """Send one prompt to the stand-in page and time the streamed response."""
+    driver.get(url)
+    metrics = Metrics()
+    # "delta" streams partial elements with receive_deltas on top of polling
+    interface = GrokInterface(receive_mode="poll" if receive_mode == "delta" else receive_mode, metrics=metrics)
+    interface.driver = driver
+    receive = interface.receive_deltas if receive_mode == "delta" else interface.receive_message
+
+    start = time.perf_counter()
+    interface.send_message("benchmark prompt")
+    sent = time.perf_counter()
+    counter["calls"] = 0
+    # The interface runs on this thread, so its CPU time excludes the stand-in server
+    cpu_start = time.thread_time()
+    browser_start = browser_cpu(driver)
+
+    first_chunk = None
+    chunks = 0
+    async for _ in receive():
+        if first_chunk is None:
+            first_chunk = time.perf_counter() - sent
+        chunks += 1
+    browser_end = browser_cpu(driver)
+    return {
+        "send": sent - start,
+        "first_chunk": first_chunk,
+        "total": time.perf_counter() - sent,
+        "chunks": chunks,
+        "round_trips": counter["calls"],
+        "polls": metrics.counters.get("polls", 0),
+        "cpu": time.thread_time() - cpu_start,
+        "browser_cpu": None if browser_start is None else browser_end - browser_start,
+    }
+
+
+def new_driver():
+    chrome_options = Options()
+    chrome_options.add_argument("--headless=new")
+    chrome_options.add_argument("--disable-gpu")
+    return webdriver.Chrome(options=chrome_options)
+
+
+def browser_memory(driver):
+    """Resident memory of the Chrome processes behind a driver, in MB."""
+    try:
+        import psutil
+    except ImportError:
+        raise SystemExit("The memory report needs psutil: pip install psutil")
+    processes = psutil.Process(driver.service.process.pid).children(recursive=True)
+    total = 0
+    renderers = []
+    for process in processes:
+        try:
+            rss = process.memory_info().rss / 2**20
+            if "--type=renderer" in process.cmdline():
+                renderers.append(rss)
+        except psutil.NoSuchProcess:
+            continue
+        total += rss
+    return {"total": total, "processes": len(processes), "renderers": renderers}
+
+
+def density(url, sessions):
+    """Compare Chrome memory for process-per-session against one process with a tab per session."""
+    drivers = [new_driver() for _ in range(sessions)]
+    try:
+        for driver in drivers:
+            driver.get(url)
+        separate = [browser_memory(driver) for driver in drivers]
+    finally:
+        for driver in drivers:
+            driver.quit()
+
+    driver = new_driver()
+    try:
+        driver.get(url)
+        for _ in range(sessions - 1):
+            driver.switch_to.new_window('tab')
+            driver.get(url)
+        tabs = browser_memory(driver)
+    finally:
+        driver.quit()
+
+    separate_total = sum(m["total"] for m in separate)
+    print(f"process per session: {separate_total:8.1f} MB total, "
+          f"{separate_total / sessions:7.1f} MB per conversation, "
+          f"{sum(m['processes'] for m in separate)} processes")
+    print(f"tabs in one process: {tabs['total']:8.1f} MB total, "
+          f"{tabs['total'] / sessions:7.1f} MB per conversation, "
+          f"{tabs['processes']} processes")
+    for i, rss in enumerate(tabs["renderers"]):
+        print(f"  renderer {i}: {rss:7.1f} MB")
+    print(f"density gain: {separate_total / tabs['total']:.2f}x conversations per GB")
+
+
+def lean_compare(url, runs):
+    """Compare page load time and memory of the default and the lean browser setup."""
+    for lean in (False, True):
+        load_times = []
+        memory = []
+        for _ in range(runs):
+            driver = GrokInterface()._setup_driver(headless=True, lean=lean)
+            try:
+                start = time.perf_counter()
+                driver.get(url)
+                load_times.append(time.perf_counter() - start)
+                memory.append(browser_memory(driver)["total"])
+            finally:
+                driver.quit()
+        print(f"{'lean' if lean else 'default':>7}: "
+              f"page load {sum(load_times) / runs * 1000:8.1f} ms  "
+              f"memory {sum(memory) / runs:7.1f} MB")
+
+
+def input_compare(driver, url, sizes, keys_limit, runs):
+    """Time entering prompts of the given sizes (KB) with send_keys and with the bulk input path."""
+    line = " ".join(LOREM_WORDS) + "\n"
+    for size in sizes:
+        prompt = (line * (size * 1024 // len(line) + 1))[:size * 1024]
+        timings = {}
+        for method, threshold in (("send_keys", None), ("bulk", 0)):
+            if method == "send_keys" and size > keys_limit:
+                continue
+            metrics = Metrics()
+            for _ in range(runs):
+                driver.get(url)
+                interface = GrokInterface(metrics=metrics, bulk_input_threshold=threshold)
+                interface.driver = driver
+                interface.send_message(prompt)
+            timings[method] = metrics.histograms["send_input_seconds"].sum / runs
+        print(f"{size:4d} KB: " + "  ".join(f"{method} {seconds * 1000:9.1f} ms" for method, seconds in timings.items()))
+
+
+async def long_conversation(driver, url, turns):
+    """Send turns prompts in one conversation and show how the cost of a poll develops."""
+    driver.get(url)
+    interface = GrokInterface()
+    interface.driver = driver
+    step = max(1, turns // 10)
+    for turn in range(1, turns + 1):
+        interface.send_message(f"prompt {turn}")
+        async for _ in interface.receive_message():
+            pass
+        if turn % step == 0:
+            start = time.perf_counter()
+            for _ in range(10):
+                interface._run_extractor("poll()")
+            poll = (time.perf_counter() - start) / 10
+            print(f"turn {turn:5d}: poll {poll * 1000:6.2f} ms  page elements {driver.execute_script(DOM_SIZE_SCRIPT):7d}")
+
+
+def report(mode, results):
+    n = len(results)
+    line = (f"{mode:>5}: "
+            f"first chunk {sum(r['first_chunk'] for r in results) / n * 1000:8.1f} ms  "
+            f"total {sum(r['total'] for r in results) / n:6.2f} s  "
+            f"chunks {sum(r['chunks'] for r in results) / n:5.1f}  "
+            f"polls {sum(r['polls'] for r in results) / n:5.1f}  "
+            f"round trips {sum(r['round_trips'] for r in results) / n:6.1f}  "
+            f"cpu {sum(r['cpu'] for r in results) / n * 1000:7.1f} ms")
+    if all(r["browser_cpu"] is not None for r in results):
+        line += f"  browser cpu {sum(r['browser_cpu'] for r in results) / n * 1000:7.1f} ms"
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark GrokInterface receive modes against a local stand-in page.")
+    parser.add_argument("--paragraphs", type=int, default=20)
+    parser.add_argument("--words", type=int, default=40, help="words per paragraph")
+    parser.add_argument("--code", type=int, default=0, help="code blocks in the response")
+    parser.add_argument("--interval", type=int, default=100, help="milliseconds to stream one paragraph")
+    parser.add_argument("--rate", type=float, help="tokens per second, overrides --interval")
+    parser.add_argument("--input-sizes", metavar="KB,KB,...",
+                        help="time send_keys against bulk input for prompts of these sizes instead")
+    parser.add_argument("--keys-limit", type=int, default=50,
+                        help="largest prompt in KB to also type with send_keys in --input-sizes")
+    parser.add_argument("--turns", type=int, metavar="N",
+                        help="send N prompts in one conversation and report the poll cost as it grows")
+    parser.add_argument("--fake", action="store_true",
+                        help="run against the pure-Python FakeDriver instead of Chrome and the stand-in page")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="seconds the FakeDriver adds to every WebDriver round trip")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--modes", default="poll,push,network,delta")
+    parser.add_argument("--density", type=int, metavar="N",
+                        help="compare memory of N sessions as processes versus tabs (needs psutil)")
+    parser.add_argument("--assets", type=int, default=0, help="heavy images, fonts and videos on the page")
+    parser.add_argument("--lean", action="store_true",
+                        help="compare page load and memory of the default and lean browser setup (needs psutil)")
+    args = parser.parse_args()
+
+    query = (f"?paragraphs={args.paragraphs}&words={args.words}&code={args.code}"
+             f"&interval={args.interval}&assets={args.assets}")
+    if args.rate:
+        query += f"&rate={args.rate}"
+
+    sizes = [int(size) for size in args.input_sizes.split(",")] if args.input_sizes else None
+
+    if args.fake:
+        # Model typing as one millisecond per character
+        driver = FakeDriver(stand_in_events, latency=args.latency, key_delay=0.001 if sizes else 0.0)
+        if sizes:
+            input_compare(driver, "fake:/" + query, sizes, args.keys_limit, args.runs)
+            return
+        counter = count_round_trips(driver)
+        for mode in args.modes.split(","):
+            results = [asyncio.run(run_once(driver, counter, "fake:/" + query, mode)) for _ in range(args.runs)]
+            report(mode, results)
+        return
+
+    server = start_server()
+    url = f"http://127.0.0.1:{server.server_port}/" + query
+
+    if args.lean:
+        try:
+            lean_compare(url, args.runs)
+        finally:
+            server.shutdown()
+        return
+
+    if args.density:
+        try:
+            density(url, args.density)
+        finally:
+            server.shutdown()
+        return
+
+    driver = new_driver()
+    if args.turns:
+        try:
+            asyncio.run(long_conversation(driver, url, args.turns))
+        finally:
+            driver.quit()
+            server.shutdown()
+        return
+
+    if sizes:
+        try:
+            input_compare(driver, url, sizes, args.keys_limit, args.runs)
+        finally:
+            driver.quit()
+            server.shutdown()
+        return
+
+    counter = count_round_trips(driver)
+    try:
+        for mode in args.modes.split(","):
+            results = [asyncio.run(run_once(driver, counter, url, mode)) for _ in range(args.runs)]
+            report(mode, results)
+    finally:
+        driver.quit()
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
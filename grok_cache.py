@@ -0,0 +1,189 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import time
+import unicodedata
+
+CACHE_FILE = "grok_cache.sqlite3"
+
+
+def normalize_prompt(prompt):
+    """Normalize a prompt for cache lookups: Unicode NFC and collapsed whitespace."""
+    return " ".join(unicodedata.normalize("NFC", prompt).split())
+
+
+def cache_key(prompt, context=None):
+    """Hash of the normalized prompt plus a fingerprint of the conversation context."""
+    fingerprint = hashlib.sha256(json.dumps(context, sort_keys=True, default=str).encode()).hexdigest()
+    return hashlib.sha256(f"{fingerprint}\n{normalize_prompt(prompt)}".encode()).hexdigest()
+
+
+class _Flight:
+    """One in-flight request whose chunks are shared with identical concurrent requests."""
+
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.changed = asyncio.Condition()
+
+    async def publish(self, chunk=None, done=False, error=None):
+        async with self.changed:
+            if chunk is not None:
+                self.chunks.append(chunk)
+            self.done = self.done or done
+            self.error = self.error or error
+            self.changed.notify_all()
+
+    async def follow(self):
+        index = 0
+        while True:
+            async with self.changed:
+                await self.changed.wait_for(lambda: len(self.chunks) > index or self.done)
+                chunks = self.chunks[index:]
+                finished = self.done
+            for chunk in chunks:
+                yield chunk
+            index += len(chunks)
+            if finished and index == len(self.chunks):
+                if self.error:
+                    raise self.error
+                return
+
+
+class ResponseCache:
+    """
+    On-disk cache of response chunk sequences, stored in SQLite.
+
+    Entries are keyed by cache_key(prompt, context) and evicted least
+    recently used first once there are more than max_entries of them or
+    they take more than max_bytes. Entries older than ttl seconds count
+    as misses. Identical requests that arrive while one is in flight share
+    its chunks instead of sending the prompt again.
+    """
+
+    def __init__(self, path=CACHE_FILE, max_entries=10000, max_bytes=100 * 2**20, ttl=7 * 24 * 60 * 60):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.db = sqlite3.connect(path)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, chunks TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self.db.commit()
+        self._inflight = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.coalesced = 0
+
+    def get(self, key):
+        """Stored chunks for key, or None if missing or expired."""
+        row = self.db.execute("SELECT chunks, created FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        if self.ttl is not None and now - row[1] > self.ttl:
+            self.db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self.db.commit()
+            self.expirations += 1
+            return None
+        self.db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+        self.db.commit()
+        return json.loads(row[0])
+
+    def put(self, key, chunks):
+        """Store chunks under key and evict entries beyond the size limits."""
+        data = json.dumps(chunks)
+        now = time.time()
+        self.db.execute(
+            "INSERT OR REPLACE INTO responses (key, chunks, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+            (key, data, len(data), now, now),
+        )
+        self._evict()
+        self.db.commit()
+
+    def _evict(self):
+        if self.ttl is not None:
+            expired = self.db.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl,)).rowcount
+            self.expirations += expired
+        count, size = self.db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        if count <= self.max_entries and size <= self.max_bytes:
+            return
+        victims = []
+        for key, entry_size in self.db.execute("SELECT key, size FROM responses ORDER BY accessed"):
+            if count <= self.max_entries and size <= self.max_bytes:
+                break
+            victims.append((key,))
+            count -= 1
+            size -= entry_size
+        self.db.executemany("DELETE FROM responses WHERE key = ?", victims)
+        self.evictions += len(victims)
+
+    async def ask(self, ask, message, context=None):
+        """
+        Asynchronous generator yielding the response to message.
+
+        ask is the uncached source, e.g. GrokInterfacePool.ask. Hits are
+        replayed from disk without touching it; a miss calls it once and
+        stores the chunks only if it finished without raising. Responses cut
+        off at their deadline raise grok_interface.IncompleteResponseError
+        and are therefore never stored.
+
+        context describes everything besides message that the answer
+        depends on, such as the earlier messages of the conversation it is
+        sent in; None stands for a new conversation.
+        """
+        key = cache_key(message, context)
+        chunks = self.get(key)
+        if chunks is not None:
+            self.hits += 1
+            for chunk in chunks:
+                yield chunk
+            return
+
+        flight = self._inflight.get(key)
+        if flight is not None:
+            self.coalesced += 1
+            async for chunk in flight.follow():
+                yield chunk
+            return
+
+        self.misses += 1
+        flight = self._inflight[key] = _Flight()
+        try:
+            async for chunk in ask(message):
+                await flight.publish(chunk)
+                yield chunk
+        except BaseException as e:
+            # Also reached when the consumer stops reading early (GeneratorExit)
+            await flight.publish(done=True, error=e if isinstance(e, Exception) else Exception("Request was cancelled."))
+            raise
+        else:
+            self.put(key, flight.chunks)
+            await flight.publish(done=True)
+        finally:
+            del self._inflight[key]
+
+    def stats(self):
+        """Hit, miss, eviction and coalescing counters plus the current cache size."""
+        entries, size = self.db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "coalesced": self.coalesced,
+            "entries": entries,
+            "bytes": size,
+        }
+
+    def close(self):
+        """Close the database."""
+        self.db.close()
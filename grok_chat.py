@@ -1,6 +1,13 @@
+import argparse
 import asyncio
+import json
+import os
 import sys
-from grok_interface import GrokInterface
+import time
+from grok_chunks import markdown
+from grok_interface import GrokInterface, IncompleteResponseError
+from grok_pool import GrokInterfacePool
+from grok_cache import ResponseCache
 
 async def chat_with_grok():
     """Main function to handle chatting with Grok via the interface."""
@@ -26,9 +33,12 @@ async def chat_with_grok():
             interface.send_message(message)
             
             print("Grok: ", end="", flush=True)
-            async for response in interface.receive_message():
-                # Add an extra newline after each paragraph for better readability
-                print(response, end="\n", flush=True)  # Extra newline for spacing
+            try:
+                async for response in markdown(interface.receive_chunks()):
+                    # Add an extra newline after each paragraph for better readability
+                    print(response, end="\n", flush=True)  # Extra newline for spacing
+            except IncompleteResponseError as e:
+                print(f"Warning: {e}")
             print()  # Final newline after the complete response
             
     except Exception as e:
@@ -37,10 +47,158 @@ async def chat_with_grok():
         interface.close()
         print("Connection closed.")
 
+def read_prompts(path, done):
+    """Lazily yield (id, prompt) from a JSONL file, skipping ids in done."""
+    with open(path, 'r') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError:
+                print(f"Warning: Skipping invalid JSON on line {line_number} of '{path}'.")
+                continue
+            prompt_id = str(item.get("id", item.get("request_id", line_number)))
+            prompt = item.get("prompt") or item.get("message") or item.get("body")
+            if not prompt:
+                print(f"Warning: Skipping line {line_number} of '{path}': no prompt.")
+                continue
+            if prompt_id not in done:
+                yield prompt_id, prompt
+
+
+def read_results(path):
+    """
+    The records of a batch output file by id. A failed prompt is retried
+    on resume and its new record appended, so the last record of an id wins.
+    """
+    records = {}
+    if not os.path.exists(path):
+        return records
+    with open(path, 'r') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A run that crashed mid-write leaves a partial last line
+                continue
+            records[record["id"]] = record
+    return records
+
+
+def read_checkpoint(path):
+    """Ids already answered in an earlier run, read from the output file."""
+    return {prompt_id for prompt_id, record in read_results(path).items() if "error" not in record}
+
+
+def drop_partial_line(path):
+    """Cut off a partial last line left by a run that crashed mid-write, so new records start on a line of their own."""
+    if not os.path.exists(path):
+        return
+    with open(path, 'rb+') as f:
+        end = f.seek(0, os.SEEK_END)
+        position = end
+        while position > 0:
+            start = max(0, position - 4096)
+            f.seek(start)
+            block = f.read(position - start)
+            newline = block.rfind(b"\n")
+            if newline != -1:
+                position = start + newline + 1
+                break
+            position = start
+        if position < end:
+            f.truncate(position)
+
+
+async def run_batch(input_path, output_path, concurrency, cache_path=None):
+    """
+    Answer every prompt of a JSONL file with bounded concurrency, resuming
+    from output_path. With cache_path, answers are served from and stored
+    in a ResponseCache.
+
+    Every prompt is sent in a new conversation, so no answer depends on the
+    prompts that happened to run before it on the same session.
+
+    Failed prompts are recorded with an "error" and retried on resume, which
+    appends another record with the same id; read_results keeps the last.
+    """
+    done = read_checkpoint(output_path)
+    drop_partial_line(output_path)
+    if done:
+        print(f"Resuming: {len(done)} prompts already answered.")
+    prompts = read_prompts(input_path, done)
+    latencies = []
+    failures = 0
+
+    pool = GrokInterfacePool(size=concurrency, rotate_after_turns=1)
+    print(f"Starting {concurrency} sessions...")
+    await pool.start()
+    cache = ResponseCache(cache_path) if cache_path else None
+    # Every prompt starts a new conversation, so there is no context to key on
+    ask = (lambda message: cache.ask(pool.ask, message)) if cache else pool.ask
+    started = time.perf_counter()
+
+    with open(output_path, 'a') as out:
+        def checkpoint(record):
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+            os.fsync(out.fileno())
+
+        async def worker():
+            nonlocal failures
+            # Workers share one lazy iterator, so the file is never read ahead
+            for prompt_id, prompt in prompts:
+                prompt_started = time.perf_counter()
+                record = {"id": prompt_id, "prompt": prompt}
+                try:
+                    record["response"] = "".join([chunk async for chunk in ask(prompt)])
+                except Exception as e:
+                    record["error"] = str(e)
+                    failures += 1
+                record["latency"] = round(time.perf_counter() - prompt_started, 3)
+                if "error" not in record:
+                    latencies.append(record["latency"])
+                checkpoint(record)
+                print(f"[{prompt_id}] {'failed' if 'error' in record else 'done'} in {record['latency']:.1f}s")
+
+        try:
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+        finally:
+            await pool.close()
+            if cache:
+                print(f"Cache: {cache.stats()}")
+                cache.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"Answered {len(latencies)} prompts ({failures} failed) in {elapsed:.1f}s: "
+          f"{len(latencies) / elapsed * 60 if elapsed else 0:.1f} prompts/min")
+    if latencies:
+        latencies.sort()
+        print(f"Latency per prompt: mean {sum(latencies) / len(latencies):.1f}s, "
+              f"p50 {latencies[len(latencies) // 2]:.1f}s, "
+              f"p90 {latencies[min(len(latencies) - 1, int(len(latencies) * 0.9))]:.1f}s, "
+              f"max {latencies[-1]:.1f}s")
+
+
 def main():
-    """Run the async chat function."""
+    """Run the interactive chat, or answer a JSONL file of prompts with --batch."""
+    parser = argparse.ArgumentParser(description="Chat with Grok.")
+    parser.add_argument("--batch", metavar="IN_JSONL",
+                        help="answer the prompts of a JSONL file instead of chatting")
+    parser.add_argument("--out", metavar="OUT_JSONL", default="responses.jsonl",
+                        help="where --batch writes answers; an existing file is resumed")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="concurrent sessions for --batch")
+    parser.add_argument("--cache", metavar="SQLITE_FILE",
+                        help="serve repeated --batch prompts from this response cache")
+    args = parser.parse_args()
+
     try:
-        asyncio.run(chat_with_grok())
+        if args.batch:
+            asyncio.run(run_batch(args.batch, args.out, args.jobs, args.cache))
+        else:
+            asyncio.run(chat_with_grok())
     except KeyboardInterrupt:
         print("\nChat interrupted by user.")
     except Exception as e:
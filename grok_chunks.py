@@ -0,0 +1,52 @@
+import time
+
+
+class Chunk:
+    """
+    One piece of a response, as receive_chunks yields it.
+
+    kind is "text" for a paragraph or list item, "code" for a code block,
+    and "raw" for answer text read from the response stream in "network"
+    receive mode, which is markdown already. language is the code block's
+    language and "" otherwise. index numbers the chunks of one response
+    from 0, and element_id is the extractor's id of the element
+    ("response" in network mode). started and received are
+    time.monotonic() readings of when receiving the response began and
+    when this chunk was read.
+    """
+
+    __slots__ = ("kind", "language", "text", "index", "element_id", "started", "received")
+
+    def __init__(self, kind, text, index=0, element_id=None, language="", started=None, received=None):
+        self.kind = kind
+        self.language = language
+        self.text = text
+        self.index = index
+        self.element_id = element_id
+        self.received = time.monotonic() if received is None else received
+        self.started = self.received if started is None else started
+
+    @property
+    def elapsed(self):
+        """Seconds from the start of receiving to this chunk."""
+        return self.received - self.started
+
+    def __repr__(self):
+        return (f"Chunk({self.kind!r}, {self.text[:40]!r}, index={self.index}, "
+                f"language={self.language!r}, elapsed={self.elapsed:.3f})")
+
+
+def to_markdown(chunk):
+    """Render a chunk the way receive_message yields it."""
+    if chunk.kind == "code":
+        return f"```{chunk.language}\n{chunk.text}\n```\n"
+    if chunk.kind == "raw":
+        return chunk.text
+    # Paragraphs and list items end in a single newline
+    return chunk.text + "\n"
+
+
+async def markdown(chunks):
+    """Asynchronous generator rendering every Chunk of chunks with to_markdown."""
+    async for chunk in chunks:
+        yield to_markdown(chunk)
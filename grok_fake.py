@@ -0,0 +1,360 @@
+import json
+import time
+from urllib.parse import parse_qs, urlparse
+
+from selenium.common.exceptions import NoSuchElementException, WebDriverException
+
+from grok_interface import (GrokInterface, AsyncGrokInterface, EXTRACTOR_SCRIPT, PUSH_WAIT_SCRIPT,
+                            NETWORK_WAIT_SCRIPT, FOCUS_INPUT_SCRIPT, SET_INPUT_SCRIPT, INPUT_LENGTH_SCRIPT,
+                            DOM_SIZE_SCRIPT, NAVIGATE_SCRIPT, ARRIVED_SCRIPT)
+from grok_pool import GrokInterfacePool
+from grok_supervisor import GrokSupervisor
+
+
+class FakeElement:
+    """The chat input or the Submit button of a FakeDriver page."""
+
+    def __init__(self, driver, kind):
+        self.driver = driver
+        self.kind = kind
+
+    def is_displayed(self):
+        return True
+
+    def is_enabled(self):
+        return True
+
+    def clear(self):
+        if self.kind == "textarea":
+            self.driver.input_value = ""
+            self.driver.input_selected = False
+
+    def send_keys(self, *values):
+        if self.kind == "textarea":
+            text = "".join(values)
+            time.sleep(self.driver.key_delay * len(text))
+            self.driver.insert_text(text)
+
+    def click(self):
+        if self.kind == "button":
+            self.driver.submit()
+
+
+class FakeDriver:
+    """
+    Pure-Python stand-in for a Chrome WebDriver on the Grok chat page.
+
+    It answers the calls GrokInterface makes - element lookups, the
+    extractor's poll/deltas/final/observe calls, the push and network
+    long-polls - from a model of the page instead of a browser, so receive
+    paths can be exercised and timed without Chrome.
+
+    respond(query, message) returns the (delay, event) pairs of the answer
+    in Grok's newline-delimited JSON format, where query holds the
+    parameters of the URL passed to get(); a URL without parameters, such
+    as the chat URL a new conversation opens, keeps the previous ones.
+    Events are delivered in real time after the Submit button is clicked.
+    latency adds that many seconds to every round trip to mimic
+    WebDriver's HTTP overhead, and key_delay that many seconds per
+    character typed with send_keys. A page takes load_delay seconds to
+    load: get() blocks for that long, like Chrome's default page load
+    strategy, while a navigation by NAVIGATE_SCRIPT returns at once and
+    keeps the old page until the new one has loaded.
+
+    crash() makes every later call fail the way calls to a dead Chrome do,
+    and challenge() replaces the chat with a Cloudflare challenge until
+    the next get().
+    """
+
+    def __init__(self, respond, latency=0.0, key_delay=0.0, load_delay=0.0):
+        self.respond = respond
+        self.latency = latency
+        self.key_delay = key_delay
+        self.load_delay = load_delay
+        # (url, time.monotonic() it has loaded at) of a navigation by script
+        self.navigation = None
+        self.current_window_handle = "fake"
+        self.window_handles = ["fake"]
+        self.crashed = False
+        self.query = {}
+        self.get("about:blank")
+
+    def crash(self):
+        self.crashed = True
+
+    def challenge(self):
+        self.captcha = True
+
+    def _round_trip(self):
+        time.sleep(self.latency)
+        if self.crashed:
+            raise WebDriverException("chrome not reachable")
+        if self.navigation is not None and time.monotonic() >= self.navigation[1]:
+            url, self.navigation = self.navigation[0], None
+            self._load(url)
+
+    def get(self, url):
+        """Load a fresh, empty chat page."""
+        self._round_trip()
+        time.sleep(self.load_delay)
+        self._load(url)
+
+    def _load(self, url):
+        self.navigation = None
+        self.leaving = False
+        self.captcha = False
+        query = {key: values[0] for key, values in parse_qs(urlparse(url).query).items()}
+        if query:
+            self.query = query
+        self.input_value = ""
+        self.input_selected = False
+        self.bubbles = 0
+        self.marked = 0
+        self.streams = []
+        self.stream_read = 0
+        self._reset_response([])
+
+    def _reset_response(self, events):
+        self.events = []
+        elapsed = 0.0
+        for delay, event in events:
+            elapsed += delay
+            self.events.append((elapsed, event))
+        self.delivered = 0
+        self.started = time.monotonic()
+        # Rendered elements of the latest bubble: dicts with type, language and text
+        self.elements = []
+        self.open_element = None
+        self.emitted = set()
+        self.sent = {}
+
+    def insert_text(self, text):
+        """Type or insert text at the end of the input, replacing it if it is selected."""
+        if self.input_selected:
+            self.input_value = ""
+            self.input_selected = False
+        self.input_value += text
+
+    def _input_length(self):
+        return len(self.input_value.replace("\r\n", "\n").replace("\r", "\n").encode("utf-16-le")) // 2
+
+    def submit(self):
+        message, self.input_value = self.input_value, ""
+        self.bubbles += 1
+        self._reset_response(self.respond(self.query, message))
+        self.streams.append([])
+
+    def _advance(self):
+        """Apply every event that is due by now, the way the page renders tokens."""
+        now = time.monotonic() - self.started
+        while self.delivered < len(self.events) and self.events[self.delivered][0] <= now:
+            event = self.events[self.delivered][1]
+            self.delivered += 1
+            self.streams[-1].append(json.dumps(event) + "\n")
+            token = event.get("result", {}).get("response", {}).get("token")
+            if not token:
+                continue
+            if token == "\n\n":
+                self.open_element = None
+            elif self.open_element is None:
+                if token.startswith("```"):
+                    self.open_element = {"type": "code", "language": token[3:].strip(), "text": ""}
+                else:
+                    self.open_element = {"type": "text", "text": token}
+                self.elements.append(self.open_element)
+            elif not (self.open_element["type"] == "code" and token == "\n```"):
+                self.open_element["text"] += token
+
+    def _complete(self):
+        return bool(self.events) and self.delivered == len(self.events)
+
+    def _next_event_in(self):
+        """Seconds until the next event is due, or None if the response is complete."""
+        if self.delivered == len(self.events):
+            return None
+        return max(0.0, self.events[self.delivered][0] - (time.monotonic() - self.started))
+
+    def _items(self):
+        """Elements of the latest bubble with their positional ids, as the extractor numbers them."""
+        items = []
+        for index, element in enumerate(self.elements):
+            item = dict(element, id=f"{element['type']}_{index}")
+            if element["type"] == "text":
+                item["text"] = element["text"].strip()
+            items.append(item)
+        return items
+
+    def _extract(self, complete):
+        """New completed elements, like extract() in EXTRACTOR_SCRIPT."""
+        items = self._items()
+        results = []
+        for i, item in enumerate(items):
+            if item["id"] in self.emitted:
+                continue
+            if item["type"] == "text":
+                done = complete or (i + 1 < len(items) and items[i + 1]["type"] == "text")
+            else:
+                done = complete
+            if done:
+                self.emitted.add(item["id"])
+                results.append(dict(item, isComplete=True))
+        return results
+
+    def _deltas(self):
+        results = []
+        for item in self._items():
+            sent = self.sent.get(item["id"], 0)
+            if len(item["text"]) > sent:
+                self.sent[item["id"]] = len(item["text"])
+                results.append(dict(item, text=item["text"][sent:]))
+        return results
+
+    def _extractor_call(self, call):
+        self._advance()
+        if call == "mark()":
+            self.marked = self.bubbles
+            return True
+        if call == "started()":
+            return self.bubbles > self.marked
+        if call == "observe()":
+            return self.bubbles > 0
+        if call == "final()":
+            return self._extract(True)
+        if not self.bubbles:
+            return {"complete": False, "items": []}
+        complete = self._complete()
+        if call == "deltas()":
+            return {"complete": complete, "items": self._deltas()}
+        return {"complete": complete, "items": self._extract(complete)}
+
+    def _long_poll(self, ready, timeout_ms):
+        """Wait in real time until ready() returns a result or timeout_ms passes."""
+        deadline = time.monotonic() + timeout_ms / 1000
+        while True:
+            self._advance()
+            result = ready()
+            if result is not None:
+                return result
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            wait = self._next_event_in()
+            time.sleep(remaining if wait is None else min(wait, remaining))
+
+    def _push_ready(self):
+        complete = self._complete()
+        items = self._extract(complete)
+        if items or complete:
+            return {"items": items, "complete": complete}
+        return None
+
+    def _network_ready(self, index):
+        if index >= len(self.streams):
+            return None
+        done = index < len(self.streams) - 1 or self._complete()
+        chunks = self.streams[index]
+        if not chunks and not done:
+            return None
+        self.streams[index] = []
+        return {"text": "".join(chunks), "complete": done}
+
+    def execute_script(self, script, *args):
+        self._round_trip()
+        if script.startswith("return window.__grok ? window.__grok."):
+            return self._extractor_call(script[len("return window.__grok ? window.__grok."):-len(" : null;")])
+        if script.endswith("return window.__grokNet.streams.length;"):
+            return len(self.streams)
+        if script == "return 1;":
+            return 1
+        if script == NAVIGATE_SCRIPT:
+            self.leaving = True
+            self.navigation = (args[0], time.monotonic() + self.load_delay)
+            return None
+        if script == ARRIVED_SCRIPT:
+            return not self.leaving
+        if script == EXTRACTOR_SCRIPT:
+            return None
+        if script == FOCUS_INPUT_SCRIPT:
+            self.input_selected = True
+            return None
+        if script == SET_INPUT_SCRIPT:
+            self.input_value = args[1]
+            self.input_selected = False
+            return self._input_length()
+        if script == INPUT_LENGTH_SCRIPT:
+            return self._input_length()
+        if script == DOM_SIZE_SCRIPT:
+            # Page chrome plus the prompt and response of every turn
+            return 200 + 30 * self.bubbles
+        raise NotImplementedError(f"FakeDriver cannot run script: {script[:60]!r}")
+
+    def execute_async_script(self, script, *args):
+        self._round_trip()
+        if script == PUSH_WAIT_SCRIPT:
+            if not self.bubbles:
+                return False
+            return self._long_poll(self._push_ready, args[0]) or {"items": [], "complete": False}
+        if script == NETWORK_WAIT_SCRIPT:
+            return self._long_poll(lambda: self._network_ready(args[0]), args[1]) or {"text": "", "complete": False}
+        raise NotImplementedError(f"FakeDriver cannot run async script: {script[:60]!r}")
+
+    def set_script_timeout(self, seconds):
+        pass
+
+    def execute_cdp_cmd(self, cmd, params):
+        self._round_trip()
+        if cmd == "Input.insertText":
+            self.insert_text(params["text"])
+        return {}
+
+    def find_element(self, by, value):
+        self._round_trip()
+        if self.captcha:
+            raise NoSuchElementException(value)
+        if "textarea" in value:
+            return FakeElement(self, "textarea")
+        if "Submit" in value:
+            return FakeElement(self, "button")
+        raise NoSuchElementException(value)
+
+    def find_elements(self, by, value):
+        self._round_trip()
+        if value == "challenge-container":
+            return [FakeElement(self, "challenge")] if self.captcha else []
+        if self.captcha:
+            return []
+        if "message-bubble" in value:
+            return [FakeElement(self, "bubble") for _ in range(self.bubbles)]
+        if "textarea" in value:
+            return [FakeElement(self, "textarea")]
+        return []
+
+    def close(self):
+        pass
+
+    def quit(self):
+        pass
+
+
+class FakePool(GrokInterfacePool):
+    """GrokInterfacePool whose sessions run on FakeDrivers showing url, for load tests without Chrome."""
+
+    def __init__(self, respond, url="fake:/", size=2, latency=0.0, **interface_kwargs):
+        super().__init__(size=size, **interface_kwargs)
+        self.respond = respond
+        self.url = url
+        self.latency = latency
+
+    async def start(self):
+        for _ in range(self.size):
+            await self._start_session()
+
+    async def _connect(self, browser=None):
+        interface = GrokInterface(**self.interface_kwargs)
+        interface.driver = FakeDriver(self.respond, latency=self.latency)
+        interface.driver.get(self.url)
+        return AsyncGrokInterface(interface)
+
+
+class FakeSupervisor(GrokSupervisor, FakePool):
+    """GrokSupervisor whose sessions and standbys run on FakeDrivers, for failover tests without Chrome."""
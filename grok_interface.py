@@ -2,8 +2,8 @@ from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import JavascriptException, TimeoutException
 from webdriver_manager.chrome import ChromeDriverManager
 import time
 import sys
@@ -11,6 +11,10 @@ import json
 import os
 import logging
 import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from grok_chunks import Chunk, markdown
+from grok_wait import WaitStrategy
 
 logging.getLogger('WDM').setLevel(logging.NOTSET)
 logging.getLogger('requests').setLevel(logging.NOTSET)
@@ -19,34 +23,624 @@ logging.getLogger('urllib3').setLevel(logging.NOTSET)
 CHAT_URL = "https://www.grok.com"
 COOKIE_FILE = "grok_cookies.json"
 REQUIRED_COOKIES = {"cf_clearance", "sso", "sso-rw"}
+# Resolved chromedriver path, re-checked with ChromeDriverManager once a day
+DRIVER_PATH_CACHE = "grok_driver_path.json"
+DRIVER_PATH_MAX_AGE = 24 * 60 * 60  # seconds
+# Written into a persistent profile once it holds a logged-in session
+PROFILE_MARKER = "grok_profile.json"
+# Requests blocked in lean mode: images, fonts, media and telemetry
+LEAN_BLOCKED_URLS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.avif", "*.ico",
+    "*.woff", "*.woff2", "*.ttf", "*.otf",
+    "*.mp3", "*.mp4", "*.webm", "*.ogg", "*.wav",
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+    "*sentry.io*", "*segment.io*", "*mixpanel.com*", "*datadoghq.com*",
+    "*statsig*", "*intercom.io*",
+]
+
+_resolved_driver_path = None
+
+# In-page extractor, installed once per page as window.__grok and invoked by
+# short calls such as "window.__grok.poll()". Every receive path (polling,
+# the push observer and the final extraction on timeout) walks the response
+# with the same extract() function. A cursor remembers which nodes of the
+# latest response bubble were already returned, so only new completed
+# elements are serialized back to Python. The latest response bubble is
+# looked up from the end of the message list, so a call costs the same
+# however long the conversation is.
+EXTRACTOR_SCRIPT = """
+window.__grok = window.__grok || (function() {
+    const grok = {cursor: null, push: null, list: null, scanOnly: false, marked: null};
+    const RESPONSE = '.message-bubble:not(.bg-foreground)';
+
+    function lastResponseIn(node) {
+        const bubbles = node.querySelectorAll(RESPONSE);
+        return bubbles.length ? bubbles[bubbles.length - 1] : null;
+    }
+
+    // Whether node has at least two .group children, looking from the end
+    function holdsGroups(node) {
+        let groups = 0;
+        for (let child = node.lastElementChild; child && groups < 2; child = child.previousElementSibling) {
+            if (child.matches('.group')) groups++;
+        }
+        return groups >= 2;
+    }
+
+    function latestBubble() {
+        // Search the whole document only until the list holding one .group
+        // per message is known, and again after it was replaced. A parent
+        // with a single .group is a per-message wrapper, not the list.
+        if (!grok.list || !grok.list.isConnected || !holdsGroups(grok.list)) {
+            const bubble = lastResponseIn(document);
+            const group = bubble && bubble.closest('.group');
+            grok.list = !grok.scanOnly && group && holdsGroups(group.parentElement) ? group.parentElement : null;
+            if (!grok.list) return bubble;
+        }
+        // The latest response is in one of the last few groups
+        for (let group = grok.list.lastElementChild; group; group = group.previousElementSibling) {
+            const bubble = group.matches(RESPONSE) ? group : lastResponseIn(group);
+            if (bubble) return bubble;
+        }
+        return null;
+    }
+
+    // The response is complete once 5 icons/buttons appear at the bottom
+    function isResponseComplete(bubble) {
+        const container = bubble.closest('.group');
+        if (!container) return false;
+        const buttonContainer = container.querySelector('.flex.items-center.gap-\\\\[2px\\\\].w-max');
+        return !!(buttonContainer && buttonContainer.querySelectorAll('button').length >= 5);
+    }
+
+    // Start a fresh cursor whenever a new response bubble appears
+    function cursorFor(bubble) {
+        if (!grok.cursor || grok.cursor.bubble !== bubble) {
+            grok.cursor = {bubble: bubble, emitted: new WeakSet()};
+        }
+        return grok.cursor;
+    }
+
+    // Text of a paragraph or list item; ordered list items get their number
+    function elementText(node) {
+        let text = node.textContent.trim();
+
+        // Handle ordered lists (add numbers)
+        if (node.tagName === 'LI') {
+            const parentList = node.closest('ol');
+            if (parentList) {
+                // Get the actual list index by counting previous siblings
+                let number = 1;
+                let sibling = node.previousElementSibling;
+                while (sibling) {
+                    number++;
+                    sibling = sibling.previousElementSibling;
+                }
+
+                // Apply starting index offset if specified
+                const startAttr = parentList.getAttribute('start');
+                if (startAttr) {
+                    const start = parseInt(startAttr);
+                    if (!isNaN(start)) {
+                        number = start + number - 1;
+                    }
+                }
+
+                // Prepend the number to the text
+                text = number + ". " + text;
+            }
+        }
+        return text;
+    }
+
+    // Language label and code of a code block
+    function codeBlock(node) {
+        const langElement = node.querySelector('.font-mono');
+        const codeElement = node.querySelector('code');
+        return {
+            language: langElement ? langElement.textContent.trim() : '',
+            text: codeElement ? codeElement.textContent : node.textContent
+        };
+    }
+
+    // Walk nodes in their natural DOM order and return the completed
+    // paragraphs, list items and code blocks that are not in emitted yet.
+    // Ids stay positional, so already emitted nodes still advance the index
+    // but their text is neither recomputed nor returned.
+    function extract(bubble, emitted, responseIsComplete) {
+        const results = [];
+        let index = 0;
+
+        function processNode(node) {
+            // Skip script and style tags
+            if (node.tagName === 'SCRIPT' || node.tagName === 'STYLE') {
+                return;
+            }
+
+            if (emitted.has(node)) {
+                index++;
+            }
+            else if (node.tagName === 'P' || node.tagName === 'LI') {
+                const text = elementText(node);
+
+                // An element is complete once a P/LI sibling follows it
+                // or the entire response is complete
+                const next = node.nextElementSibling;
+                const isComplete = responseIsComplete ||
+                    !!(next && (next.tagName === 'P' || next.tagName === 'LI'));
+
+                if (text) {
+                    const id = 'text_' + index++;
+                    if (isComplete) {
+                        emitted.add(node);
+                        results.push({id: id, text: text, isComplete: true, type: 'text'});
+                    }
+                }
+            }
+            // Code blocks are considered complete when the response is complete
+            else if (node.classList && node.classList.contains('not-prose')) {
+                const id = 'code_' + index++;
+                if (responseIsComplete) {
+                    const code = codeBlock(node);
+                    emitted.add(node);
+                    results.push({id: id, text: code.text, language: code.language, isComplete: true, type: 'code'});
+                }
+            }
+
+            // Recursively process child nodes
+            for (const child of node.children) {
+                processNode(child);
+            }
+        }
+
+        processNode(bubble);
+        return results;
+    }
+
+    // Remember the latest response before a message is sent...
+    grok.mark = function() {
+        grok.marked = latestBubble();
+        return true;
+    };
+
+    // ...so that its answer is noticed as a different latest response
+    grok.started = function() {
+        const bubble = latestBubble();
+        if (bubble && bubble !== grok.marked) return true;
+        if (!grok.list) return false;
+        // The cached list may not be where new messages go; check the whole
+        // document and stop using the list for this page if it was wrong
+        const latest = lastResponseIn(document);
+        if (!latest || latest === grok.marked || latest === bubble) return false;
+        grok.scanOnly = true;
+        grok.list = null;
+        return true;
+    };
+
+    // One round trip per poll: completion flag and new items together
+    grok.poll = function() {
+        const bubble = latestBubble();
+        if (!bubble) return {complete: false, items: []};
+        const complete = isResponseComplete(bubble);
+        return {complete: complete, items: extract(bubble, cursorFor(bubble).emitted, complete)};
+    };
+
+    // Everything not returned yet, treating the response as complete
+    grok.final = function() {
+        const bubble = latestBubble();
+        if (!bubble) return [];
+        return extract(bubble, cursorFor(bubble).emitted, true);
+    };
+
+    // Text appended to every paragraph, list item and code block since the
+    // last call, including elements that are still being written. Assumes
+    // the page only ever appends to an element's text.
+    grok.deltas = function() {
+        const bubble = latestBubble();
+        if (!bubble) return {complete: false, items: []};
+        const complete = isResponseComplete(bubble);
+        const cursor = cursorFor(bubble);
+        if (!cursor.sent) {
+            cursor.sent = new WeakMap();
+        }
+
+        const items = [];
+        let index = 0;
+        function processNode(node) {
+            if (node.tagName === 'SCRIPT' || node.tagName === 'STYLE') {
+                return;
+            }
+
+            let item = null;
+            if (node.tagName === 'P' || node.tagName === 'LI') {
+                const text = elementText(node);
+                if (text) {
+                    item = {id: 'text_' + index++, text: text, type: 'text'};
+                }
+            }
+            else if (node.classList && node.classList.contains('not-prose')) {
+                const code = codeBlock(node);
+                item = {id: 'code_' + index++, text: code.text, language: code.language, type: 'code'};
+            }
+
+            if (item) {
+                const sent = cursor.sent.get(node) || 0;
+                if (item.text.length > sent) {
+                    cursor.sent.set(node, item.text.length);
+                    item.text = item.text.slice(sent);
+                    items.push(item);
+                }
+            }
+
+            for (const child of node.children) {
+                processNode(child);
+            }
+        }
+
+        processNode(bubble);
+        return {complete: complete, items: items};
+    };
+
+    // Buffer completed elements of the latest bubble from a MutationObserver
+    grok.observe = function() {
+        const bubble = latestBubble();
+        if (!bubble) return false;
+        if (grok.push) {
+            grok.push.observer.disconnect();
+        }
+
+        const state = {queue: [], complete: false, waiter: null, observer: null};
+        const cursor = cursorFor(bubble);
+
+        function scan() {
+            const complete = isResponseComplete(bubble);
+            state.queue.push(...extract(bubble, cursor.emitted, complete));
+            if (complete) {
+                state.complete = true;
+                state.observer.disconnect();
+            }
+            if (state.waiter && (state.queue.length || state.complete)) {
+                state.waiter();
+            }
+        }
+
+        state.observer = new MutationObserver(scan);
+        state.observer.observe(bubble.closest('.group') || bubble.parentElement,
+                               {childList: true, subtree: true, characterData: true});
+        grok.push = state;
+        scan();
+        return true;
+    };
+
+    // Long-poll for observer output. Calls done as soon as items are
+    // buffered or the response is complete, otherwise after timeoutMs.
+    grok.wait = function(timeoutMs, done) {
+        const state = grok.push;
+        if (!state) {
+            done(false);
+            return;
+        }
+
+        let timer = null;
+        function flush() {
+            clearTimeout(timer);
+            state.waiter = null;
+            done({items: state.queue.splice(0), complete: state.complete});
+        }
+
+        if (state.queue.length || state.complete) {
+            flush();
+            return;
+        }
+        state.waiter = flush;
+        timer = setTimeout(flush, timeoutMs);
+    };
+
+    return grok;
+})();
+"""
+
+# Long-poll used with execute_async_script, see window.__grok.wait. Returns
+# null if the extractor is missing, e.g. because the page was reloaded, and
+# false if no observer is installed.
+PUSH_WAIT_SCRIPT = """
+const done = arguments[arguments.length - 1];
+if (!window.__grok) {
+    done(null);
+    return;
+}
+window.__grok.wait(arguments[0], done);
+"""
+
+# URL of the streaming chat response, matched as a JavaScript regular expression
+STREAM_URL_PATTERN = r"/rest/app-chat/conversations/(new|[^/?]+/responses)"
+
+# Installed before the page's own scripts when receive_mode is "network".
+# Wraps window.fetch so that every response whose URL matches the pattern is
+# cloned and read chunk by chunk into window.__grokNet.streams, independently
+# of how (or whether) the page renders it. __PATTERN__ is replaced with the
+# JSON-encoded pattern.
+NETWORK_TAP_SCRIPT = """
+(function() {
+    if (window.__grokNet) return;
+    const net = window.__grokNet = {pattern: new RegExp(__PATTERN__), streams: [], waiter: null};
+    const originalFetch = window.fetch;
+
+    function notify() {
+        if (net.waiter) net.waiter();
+    }
+
+    window.fetch = function(...args) {
+        const promise = originalFetch.apply(this, args);
+        const request = args[0];
+        const url = typeof request === 'string' ? request : (request && request.url) || String(request);
+        if (!net.pattern.test(url)) return promise;
+
+        return promise.then(function(response) {
+            if (!response.body) return response;
+            const stream = {url: url, chunks: [], done: false};
+            net.streams.push(stream);
+
+            const reader = response.clone().body.getReader();
+            const decoder = new TextDecoder();
+            function pump() {
+                return reader.read().then(function(result) {
+                    if (result.done) {
+                        stream.chunks.push(decoder.decode());
+                        stream.done = true;
+                    } else {
+                        stream.chunks.push(decoder.decode(result.value, {stream: true}));
+                    }
+                    notify();
+                    if (!result.done) return pump();
+                });
+            }
+            pump().catch(function() {
+                stream.done = true;
+                notify();
+            });
+            notify();
+            return response;
+        });
+    };
+
+    // Long-poll for text of the stream with the given index. Calls done as
+    // soon as text arrived or the stream ended, otherwise after timeoutMs.
+    net.wait = function(index, timeoutMs, done) {
+        let timer = null;
+        function flush() {
+            const stream = net.streams[index];
+            if (!stream || (!stream.chunks.length && !stream.done)) return false;
+            clearTimeout(timer);
+            net.waiter = null;
+            done({text: stream.chunks.splice(0).join(''), complete: stream.done});
+            return true;
+        }
+
+        if (flush()) return;
+        net.waiter = flush;
+        timer = setTimeout(function() {
+            net.waiter = null;
+            done({text: '', complete: false});
+        }, timeoutMs);
+    };
+})();
+"""
+
+# Long-poll used with execute_async_script, see window.__grokNet.wait.
+# Returns null if the tap is missing, e.g. because the page was reloaded.
+NETWORK_WAIT_SCRIPT = """
+const done = arguments[arguments.length - 1];
+if (!window.__grokNet) {
+    done(null);
+    return;
+}
+window.__grokNet.wait(arguments[0], arguments[1], done);
+"""
+
+# Prompts of at least this many characters skip send_keys, which sends one
+# key event per character, and are inserted in one shot instead
+BULK_INPUT_THRESHOLD = 1000
+
+# Characters typed per send_keys call, so typing a message does not hold a
+# driver shared by several tabs for long
+TYPING_SLICE = 100
+
+# Focuses the chat input and selects its contents, so that text inserted
+# next replaces them
+FOCUS_INPUT_SCRIPT = """
+const field = arguments[0];
+field.focus();
+field.select();
+"""
+
+# Sets the chat input through the native value setter, which the page's
+# framework does not intercept, then fires the input event it listens for.
+# Returns the length of the resulting value.
+SET_INPUT_SCRIPT = """
+const field = arguments[0];
+const setter = Object.getOwnPropertyDescriptor(Object.getPrototypeOf(field), 'value').set;
+setter.call(field, arguments[1]);
+field.dispatchEvent(new Event('input', {bubbles: true}));
+return field.value.length;
+"""
+
+INPUT_LENGTH_SCRIPT = "return arguments[0].value.length;"
+
+# Number of elements on the page, checked against rotate_dom_nodes
+DOM_SIZE_SCRIPT = "return document.getElementsByTagName('*').length;"
+
+# Navigates without waiting for the new page to load, unlike driver.get,
+# and flags the old page so that ARRIVED_SCRIPT can tell the two apart
+NAVIGATE_SCRIPT = """
+window.__grokLeaving = true;
+window.location.href = arguments[0];
+"""
+
+# True once the page opened with NAVIGATE_SCRIPT has replaced the old one
+ARRIVED_SCRIPT = "return !window.__grokLeaving;"
+
+
+class GrokError(Exception):
+    """Base class of the errors a GrokInterface raises instead of exiting or prompting."""
+
+
+class CookieError(GrokError):
+    """COOKIE_FILE is missing, unreadable or lacks a required cookie."""
+
+
+class CaptchaError(GrokError):
+    """Cloudflare showed a challenge that needs a person to solve it."""
+
+
+class SessionLostError(GrokError):
+    """The browser behind a session died or stopped answering."""
+
+
+class IncompleteResponseError(GrokError):
+    """
+    The response did not complete before the deadline, or its stream was
+    lost. Raised by the receive methods after yielding what did arrive.
+    """
+
+
+class TokenStreamDecoder:
+    """
+    Incrementally decodes Grok's newline-delimited JSON response stream.
+
+    Each line is an event such as
+    {"result": {"response": {"token": "Hel", "isThinking": false}}}.
+    feed() takes raw text as it arrives and returns the answer tokens found
+    in the complete lines; thinking tokens are skipped. complete turns true
+    when the stream signals the end of the answer.
+    """
 
-class GrokInterface:
     def __init__(self):
+        self._buffer = ""
+        self.complete = False
+
+    def feed(self, data):
+        self._buffer += data
+        lines = self._buffer.split("\n")
+        self._buffer = lines.pop()
+        return self._decode(lines)
+
+    def close(self):
+        """Decode whatever is left once the stream has ended."""
+        lines, self._buffer = [self._buffer], ""
+        self.complete = True
+        return self._decode(lines)
+
+    def _decode(self, lines):
+        tokens = []
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue
+            result = event.get("result", event) if isinstance(event, dict) else {}
+            response = result.get("response", result) if isinstance(result, dict) else {}
+            if not isinstance(response, dict):
+                continue
+            token = response.get("token")
+            if token and not response.get("isThinking"):
+                tokens.append(token)
+            if response.get("isSoftStop") or "modelResponse" in response or "finalMetadata" in response:
+                self.complete = True
+        return tokens
+
+
+class GrokInterface:
+    def __init__(self, receive_mode="poll", push_timeout=5, driver_options=None,
+                 stream_url_pattern=STREAM_URL_PATTERN, metrics=None,
+                 bulk_input_threshold=BULK_INPUT_THRESHOLD, wait=None, rotate_after_turns=None,
+                 rotate_dom_nodes=None, interactive=True):
+        """
+        receive_mode selects how receive_message picks up new content:
+        "poll" re-extracts the response with backoff between polls, "push" lets an
+        in-page MutationObserver buffer completed elements and long-polls for
+        them, waiting at most push_timeout seconds per round trip. "network"
+        skips the DOM: it reads the streamed HTTP response whose URL matches
+        stream_url_pattern and yields answer text as it arrives.
+
+        driver_options are extra keyword arguments for _setup_driver.
+
+        Messages of at least bulk_input_threshold characters are inserted
+        into the chat input in one shot instead of typed key by key; None
+        always types them.
+
+        metrics is an optional grok_metrics.Metrics that records the duration
+        of every connect, send and receive phase plus poll, script call, byte
+        and timeout counters. Without it nothing is recorded.
+
+        wait is a grok_wait.WaitStrategy with the per-operation timeouts and
+        the poll backoff; by default WaitStrategy().
+
+        send_message starts a new conversation first once rotate_after_turns
+        messages were sent in the current one or the page holds more than
+        rotate_dom_nodes elements, so that long-lived sessions do not slow
+        down as the history grows. The new conversation has no memory of the
+        old one. Both are off by default.
+
+        interactive sessions handle problems the way the command-line chat
+        does: they exit when the cookies cannot be loaded and wait on stdin
+        while the user solves a CAPTCHA. Otherwise they raise CookieError
+        and CaptchaError, which is what pools and servers want.
+        """
+        if receive_mode not in ("poll", "push", "network"):
+            raise ValueError(f"Unknown receive_mode: {receive_mode}")
         self.driver = None
-        self.initial_count = 0
+        # Messages sent in the current conversation
+        self.turns = 0
+        self.rotate_after_turns = rotate_after_turns
+        self.rotate_dom_nodes = rotate_dom_nodes
+        self.receive_mode = receive_mode
+        self.push_timeout = push_timeout
+        self.bulk_input_threshold = bulk_input_threshold
+        self.wait = wait or WaitStrategy()
+        self.network_tap_script = NETWORK_TAP_SCRIPT.replace("__PATTERN__", json.dumps(stream_url_pattern))
+        # Index of the response stream of the last sent message in "network" mode
+        self.stream_index = 0
+        self.driver_options = dict(driver_options or {})
+        # Seconds spent in each phase of the last connect()
+        self.connect_timings = {}
+        # Executor that runs blocking WebDriver calls made from async code.
+        # None runs them inline on the event loop thread.
+        self.executor = None
+        # Set when this session is one tab of a shared GrokBrowser
+        self.browser = None
+        self.window_handle = None
+        self.metrics = metrics
+        self.interactive = interactive
+
+    def _cookie_error(self, message):
+        print(f"Warning: {message}")
+        if self.interactive:
+            sys.exit(1)
+        raise CookieError(message)
 
     def _load_cookies(self):
         if not os.path.exists(COOKIE_FILE):
-            print(f"Warning: Cookie file '{COOKIE_FILE}' does not exist. Please provide initial cookies.")
-            sys.exit(1)
+            self._cookie_error(f"Cookie file '{COOKIE_FILE}' does not exist. Please provide initial cookies.")
         
         try:
             with open(COOKIE_FILE, 'r') as f:
                 cookies = json.load(f)
             if not cookies or not isinstance(cookies, list):
-                print(f"Warning: '{COOKIE_FILE}' is empty or invalid. Expected a list of cookies.")
-                sys.exit(1)
+                self._cookie_error(f"'{COOKIE_FILE}' is empty or invalid. Expected a list of cookies.")
             filtered_cookies = [c for c in cookies if c["name"] in REQUIRED_COOKIES]
             if not all(name in [c["name"] for c in filtered_cookies] for name in REQUIRED_COOKIES):
-                print(f"Warning: '{COOKIE_FILE}' does not contain all required cookies: {REQUIRED_COOKIES}")
-                sys.exit(1)
+                self._cookie_error(f"'{COOKIE_FILE}' does not contain all required cookies: {REQUIRED_COOKIES}")
             return filtered_cookies
+        except CookieError:
+            raise
         except json.JSONDecodeError:
-            print(f"Warning: Failed to parse '{COOKIE_FILE}'. Invalid JSON format.")
-            sys.exit(1)
+            self._cookie_error(f"Failed to parse '{COOKIE_FILE}'. Invalid JSON format.")
         except Exception as e:
-            print(f"Warning: Error loading cookies from '{COOKIE_FILE}': {e}")
-            sys.exit(1)
+            self._cookie_error(f"Error loading cookies from '{COOKIE_FILE}': {e}")
 
     def _save_cookies(self, cookies):
         filtered_cookies = [c for c in cookies if c["name"] in REQUIRED_COOKIES]
@@ -55,50 +649,200 @@ class GrokInterface:
         with open(COOKIE_FILE, 'w') as f:
             json.dump(filtered_cookies, f, indent=4)
 
-    def _setup_driver(self, headless=False, cookies=None):
+    def _mark(self, phase, start):
+        """Record how long a connect phase took since start and return the current time."""
+        now = time.perf_counter()
+        self.connect_timings[phase] = now - start
+        if self.metrics is not None:
+            self.metrics.observe(f"connect_{phase}_seconds", now - start)
+        return now
+
+    def _observe(self, name, start):
+        """Record the seconds since start in the named histogram, if metrics are on, and return the current time."""
+        now = time.perf_counter()
+        if self.metrics is not None:
+            self.metrics.observe(name, now - start)
+        return now
+
+    def _count(self, name, amount=1):
+        if self.metrics is not None:
+            self.metrics.inc(name, amount)
+
+    def _count_script(self, result):
+        """Count one script round trip and the size of what it returned."""
+        if self.metrics is not None:
+            self.metrics.inc("script_calls")
+            self.metrics.inc("script_bytes", len(json.dumps(result)))
+
+    def _driver_path(self):
+        """
+        Resolve the chromedriver executable. The path is remembered for the
+        process and cached in DRIVER_PATH_CACHE, so ChromeDriverManager only
+        runs when the cache is older than DRIVER_PATH_MAX_AGE. If it fails,
+        e.g. when offline, a stale cached path is used instead.
+        """
+        global _resolved_driver_path
+        if _resolved_driver_path and os.path.exists(_resolved_driver_path):
+            return _resolved_driver_path
+        
+        cached = None
+        try:
+            with open(DRIVER_PATH_CACHE, 'r') as f:
+                cached = json.load(f)
+            if not os.path.exists(cached["path"]):
+                cached = None
+        except (OSError, ValueError, KeyError, TypeError):
+            cached = None
+        
+        if cached and time.time() - cached.get("resolved_at", 0) < DRIVER_PATH_MAX_AGE:
+            path = cached["path"]
+        else:
+            try:
+                path = ChromeDriverManager().install()
+            except Exception as e:
+                if not cached:
+                    raise
+                print(f"Warning: Could not resolve chromedriver ({e}), using cached '{cached['path']}'.")
+                path = cached["path"]
+            else:
+                with open(DRIVER_PATH_CACHE, 'w') as f:
+                    json.dump({"path": path, "resolved_at": time.time()}, f)
+        _resolved_driver_path = path
+        return path
+
+    @staticmethod
+    def _cdp_cookie(cookie):
+        """Convert a WebDriver cookie dict to a CDP Network.CookieParam."""
+        param = {"name": cookie["name"], "value": cookie["value"], "path": cookie.get("path", "/")}
+        if cookie.get("domain"):
+            param["domain"] = cookie["domain"]
+        else:
+            param["url"] = CHAT_URL
+        for key in ("secure", "httpOnly", "sameSite"):
+            if key in cookie:
+                param[key] = cookie[key]
+        if "expiry" in cookie:
+            param["expires"] = cookie["expiry"]
+        return param
+
+    def _inject_cookies(self, driver, cookies):
+        """Set cookies before the first page load via CDP, falling back to loading the page and add_cookie."""
+        try:
+            driver.execute_cdp_cmd("Network.setCookies", {"cookies": [self._cdp_cookie(c) for c in cookies]})
+            return
+        except Exception:
+            pass
+        driver.get(CHAT_URL)
+        for cookie in cookies:
+            driver.add_cookie(cookie)
+
+    def _prepare_target(self, driver, lean=False, blocked_urls=None):
+        """Per-tab setup: install the extractor on every page load and block unwanted requests."""
+        # Have every page load install the extractor up front so that
+        # receive_message never has to send its source again
+        try:
+            driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": EXTRACTOR_SCRIPT})
+            if self.receive_mode == "network":
+                driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": self.network_tap_script})
+        except Exception:
+            pass
+        
+        patterns = (LEAN_BLOCKED_URLS if lean else []) + list(blocked_urls or [])
+        if patterns:
+            try:
+                driver.execute_cdp_cmd("Network.enable", {})
+                driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+            except Exception as e:
+                print(f"Warning: Could not block requests: {e}")
+
+    def _setup_driver(self, headless=False, cookies=None, background_tabs=False, profile_dir=None,
+                      lean=False, blocked_urls=None, renderer_process_limit=None):
+        """
+        Start Chrome. profile_dir keeps a persistent --user-data-dir, so a
+        profile that already holds the session needs no cookie injection.
+        One profile directory can only be used by one Chrome process at a time.
+
+        lean turns off images and extensions, uses the new headless mode when
+        headless and blocks LEAN_BLOCKED_URLS; blocked_urls adds further URL
+        patterns to block. renderer_process_limit caps renderer processes.
+
+        background_tabs sets Chrome up for tabs of a GrokBrowser: tabs in
+        the background keep running, and page loads do not block commands.
+        """
+        started = time.perf_counter()
         chrome_options = Options()
         chrome_options.add_argument("--disable-gpu")
         chrome_options.add_argument("--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/134.0.0.0 Safari/537.36")
         chrome_options.add_argument("--disable-blink-features=AutomationControlled")
         chrome_options.add_argument("--log-level=3")
         if headless:
-            chrome_options.add_argument("--headless")
+            chrome_options.add_argument("--headless=new" if lean else "--headless")
+        if lean:
+            chrome_options.add_argument("--blink-settings=imagesEnabled=false")
+            chrome_options.add_argument("--disable-extensions")
+            chrome_options.add_argument("--disable-background-networking")
+            chrome_options.add_argument("--disable-component-update")
+            chrome_options.add_argument("--disable-sync")
+            chrome_options.add_argument("--mute-audio")
+            chrome_options.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
+        if renderer_process_limit:
+            chrome_options.add_argument(f"--renderer-process-limit={renderer_process_limit}")
+        if background_tabs:
+            # Do not block every command of the shared driver while a tab loads
+            chrome_options.page_load_strategy = "none"
+            # Keep tabs that are not in front rendering at full speed
+            chrome_options.add_argument("--disable-background-timer-throttling")
+            chrome_options.add_argument("--disable-backgrounding-occluded-windows")
+            chrome_options.add_argument("--disable-renderer-backgrounding")
+        if profile_dir:
+            chrome_options.add_argument(f"--user-data-dir={os.path.abspath(profile_dir)}")
         service = Service(
-            executable_path=ChromeDriverManager().install(),
+            executable_path=self._driver_path(),
             log_output=os.devnull
         )
+        started = self._mark("driver_path", started)
         driver = webdriver.Chrome(service=service, options=chrome_options)
+        started = self._mark("browser_start", started)
+        
+        self._prepare_target(driver, lean, blocked_urls)
         
         if cookies:
-            driver.get(CHAT_URL)
-            for cookie in cookies:
-                driver.add_cookie(cookie)
+            self._inject_cookies(driver, cookies)
+            self._mark("cookies", started)
         return driver
 
     def _is_captcha_present(self):
+        """Wait for either the CAPTCHA or the chat input, whichever shows up first."""
+        def page_state(driver):
+            if driver.find_elements(By.ID, "challenge-container"):
+                return "captcha"
+            if driver.find_elements(By.XPATH, "//textarea[contains(@class, 'bg-transparent')]"):
+                return "chat"
+            return None
+        
         try:
-            WebDriverWait(self.driver, 5).until(
-                EC.presence_of_element_located((By.ID, "challenge-container"))
-            )
+            return self.wait.until(self.driver, page_state, "captcha") == "captcha"
+        except TimeoutException:
             return True
-        except:
-            try:
-                self.driver.find_element(By.XPATH, "//textarea[contains(@class, 'bg-transparent')]")
-                return False
-            except:
-                return True
 
     def _manual_login_and_refresh_cookies(self, existing_cookies):
         self.driver.get(CHAT_URL)
         
-        if self._is_captcha_present():
+        started = time.perf_counter()
+        captcha = self._is_captcha_present()
+        self._observe("captcha_check_seconds", started)
+        if captcha:
+            if not self.interactive:
+                raise CaptchaError("CAPTCHA detected; solve it in an interactive session to refresh the cookies.")
             print("CAPTCHA detected! Browser is already in headed mode for manual solving...")
             print("Please solve the CAPTCHA and ensure the chat page loads fully. Press Enter here when ready...")
             input("Press Enter when chat is loaded: ")
             
             try:
-                WebDriverWait(self.driver, 10).until(
-                    EC.presence_of_element_located((By.XPATH, "//textarea[contains(@class, 'bg-transparent')]"))
+                self.wait.until(
+                    self.driver,
+                    EC.presence_of_element_located((By.XPATH, "//textarea[contains(@class, 'bg-transparent')]")),
+                    "chat_load"
                 )
             except:
                 raise Exception("Chat page didn't load properly after CAPTCHA. Check URL or cookies.")
@@ -109,370 +853,607 @@ class GrokInterface:
         else:
             return existing_cookies
 
-    def connect(self):
-        """Blocking function to initialize and connect to the chat."""
-        initial_cookies = self._load_cookies()
-        self.driver = self._setup_driver(headless=False, cookies=initial_cookies)
+    def connect(self, cookies=None):
+        """
+        Blocking function to initialize and connect to the chat.
+
+        cookies may be passed in to share one set of loaded cookies between
+        several sessions; otherwise they are read from COOKIE_FILE, unless
+        the profile_dir driver option points at a profile that is already
+        logged in and COOKIE_FILE is older than that login. A failed connect
+        forgets that the profile was logged in. The time spent in each phase
+        is kept in connect_timings.
+        """
+        self.connect_timings = {}
+        connect_started = started = time.perf_counter()
+        profile_dir = self.driver_options.get("profile_dir")
+        marker = os.path.join(profile_dir, PROFILE_MARKER) if profile_dir else None
+        initial_cookies = cookies or (None if self._profile_is_warm(marker) else self._load_cookies())
+        self._mark("load_cookies", started)
+        
+        driver_options = dict({"headless": False}, **self.driver_options)
+        self.driver = self._setup_driver(cookies=initial_cookies, **driver_options)
         try:
+            started = time.perf_counter()
             updated_cookies = self._manual_login_and_refresh_cookies(initial_cookies)
-            self.initial_count = len(self.driver.find_elements(By.XPATH, "//div[contains(@class, 'message-bubble') and not(contains(@class, 'bg-foreground'))]"))
+            started = self._mark("page_load", started)
+            self._run_extractor("mark()")
+            self.turns = 0
+            self._mark("ready", started)
+            if marker:
+                with open(marker, 'w') as f:
+                    json.dump({"connected_at": time.time()}, f)
+            self._mark("total", connect_started)
         except Exception as e:
             print(f"Connection failed: {e}")
             self.driver.quit()
+            # The profile's session may have expired; inject cookies next time
+            if marker and os.path.exists(marker):
+                os.remove(marker)
             raise
 
-    def send_message(self, message):
-        """Blocking function to send a message and wait for response to start."""
+    @staticmethod
+    def _profile_is_warm(marker):
+        """
+        Whether a persistent profile holds a logged-in session, so cookie
+        injection can be skipped: it has PROFILE_MARKER, written after a
+        successful connect, and COOKIE_FILE has not changed since.
+        """
+        if not marker or not os.path.exists(marker):
+            return False
+        try:
+            return os.path.getmtime(COOKIE_FILE) <= os.path.getmtime(marker)
+        except OSError:
+            return True
+
+    def connect_tab(self, driver):
+        """Blocking function to open the chat in a new tab of an already connected driver."""
+        self._run_steps(self._connect_tab_steps(driver))
+
+    def _connect_tab_steps(self, driver):
+        """connect_tab as a generator of steps, see _send_steps."""
+        driver.switch_to.new_window('tab')
+        self.driver = driver
+        self.window_handle = driver.current_window_handle
+        if self.browser is not None:
+            self.browser.active_handle = self.window_handle
+        self._prepare_target(driver, self.driver_options.get("lean"), self.driver_options.get("blocked_urls"))
+        try:
+            yield from self._load_chat_steps("tab_load", None)
+            self._run_extractor("mark()")
+            self.turns = 0
+        except Exception as e:
+            print(f"Connection failed: {e}")
+            self.driver.close()
+            if self.browser is not None:
+                self.browser.active_handle = None
+            self.driver = None
+            raise
+
+    def _load_chat_steps(self, operation, deadline):
+        """
+        Open CHAT_URL in this tab as a generator of steps. The navigation
+        returns at once, and waiting for the new page's chat input is a
+        step, so a page load does not hold a driver shared with other tabs.
+        """
+        self.driver.execute_script(NAVIGATE_SCRIPT, CHAT_URL)
+        yield (self._chat_loaded, operation, deadline)
+
+    @staticmethod
+    def _chat_loaded(driver):
+        """Condition: the page opened with NAVIGATE_SCRIPT replaced the old one and shows the chat input."""
+        try:
+            if not driver.execute_script(ARRIVED_SCRIPT):
+                return False
+        except JavascriptException:
+            # Scripts can fail while the old page unloads
+            return False
+        return driver.find_elements(By.XPATH, "//textarea[contains(@class, 'bg-transparent')]")
+
+    def send_message(self, message, deadline=None):
+        """
+        Blocking function to send a message and wait for response to start.
+
+        deadline is an optional grok_wait.Deadline for the whole request; no
+        step waits past it, whatever its own timeout.
+        """
+        self._run_steps(self._send_steps(message, deadline))
+
+    def _send_steps(self, message, deadline):
+        """
+        send_message as a generator of steps. Every wait is yielded as
+        (condition, operation, deadline) and resumed with the condition's
+        value, or has TimeoutException thrown in; None is yielded between
+        slices of typing. The code between two yields is a few short
+        WebDriver round trips, so a runner that resumes the generator with
+        one call per step lets other tabs of a shared browser run in between.
+        """
         if not self.driver:
             raise Exception("Not connected. Call connect() first.")
         
-        input_field = WebDriverWait(self.driver, 20).until(
-            EC.presence_of_element_located((By.XPATH, "//textarea[contains(@class, 'bg-transparent')]"))
-        )
-        input_field.clear()
-        input_field.send_keys(message)
+        if self._needs_rotation():
+            yield from self._new_conversation_steps(deadline)
         
-        submit_button = WebDriverWait(self.driver, 20).until(
-            EC.element_to_be_clickable((By.XPATH, "//button[@aria-label='Submit']"))
-        )
-        submit_button.click()
-        
-        def get_grok_response_count():
-            return len(self.driver.find_elements(By.XPATH, "//div[contains(@class, 'message-bubble') and not(contains(@class, 'bg-foreground'))]"))
+        started = time.perf_counter()
+        try:
+            input_field = yield (
+                EC.presence_of_element_located((By.XPATH, "//textarea[contains(@class, 'bg-transparent')]")),
+                "input", deadline
+            )
+            yield from self._enter_text(input_field, message)
+            started = self._observe("send_input_seconds", started)
+            
+            submit_button = yield (EC.element_to_be_clickable((By.XPATH, "//button[@aria-label='Submit']")),
+                                   "submit", deadline)
+            if self.receive_mode == "network":
+                # The tap is normally installed on page load already; this covers
+                # pages loaded before it was registered. The response to this
+                # message will be the next stream it records.
+                self.stream_index = self.driver.execute_script(
+                    self.network_tap_script + "return window.__grokNet.streams.length;")
+            # Anchor on the current latest response; its successor is ours
+            self._run_extractor("mark()")
+            submit_button.click()
+            # Counted once clicked, even if the response never shows up
+            self.turns += 1
+            started = self._observe("send_submit_seconds", started)
+            
+            yield (lambda d: self._run_extractor("started()"), "response_start", deadline)
+            self._observe("send_response_start_seconds", started)
+        except TimeoutException:
+            self._count("timeouts")
+            if self.driver.find_elements(By.ID, "challenge-container"):
+                raise CaptchaError("CAPTCHA shown in place of the chat.")
+            raise
+
+    @staticmethod
+    def _resume(resume, value):
+        """Resume a generator of steps: (False, next step) or (True, its return value) once it is done."""
+        try:
+            return False, resume(value)
+        except StopIteration as stop:
+            return True, stop.value
+
+    def _run_steps(self, steps):
+        """Run a generator of steps (see _send_steps) on this thread, blocking in every wait."""
+        resume, value = steps.send, None
+        while True:
+            done, step = self._resume(resume, value)
+            if done:
+                return step
+            resume, value = steps.send, None
+            if step is not None:
+                try:
+                    value = self.wait.until(self.driver, *step)
+                except TimeoutException as e:
+                    resume, value = steps.throw, e
+
+    async def _run_steps_async(self, steps):
+        """
+        Run a generator of steps with one _call per step and wait without
+        holding the driver's thread, so sessions sharing it keep streaming.
+        """
+        def check(condition):
+            return self._call(condition, self.driver)
         
-        WebDriverWait(self.driver, 20).until(
-            lambda d: get_grok_response_count() > self.initial_count
-        )
-        self.initial_count = get_grok_response_count()
+        resume, value = steps.send, None
+        while True:
+            done, step = await self._call(self._resume, resume, value)
+            if done:
+                return step
+            resume, value = steps.send, None
+            if step is not None:
+                try:
+                    value = await self.wait.until_async(check, *step)
+                except TimeoutException as e:
+                    resume, value = steps.throw, e
+
+    def _needs_rotation(self):
+        if self.rotate_after_turns and self.turns >= self.rotate_after_turns:
+            return True
+        if self.rotate_dom_nodes:
+            return self.driver.execute_script(DOM_SIZE_SCRIPT) > self.rotate_dom_nodes
+        return False
+
+    def new_conversation(self, deadline=None):
+        """Blocking function to start a new chat in this session's tab, leaving the old history behind."""
+        self._run_steps(self._new_conversation_steps(deadline))
+
+    def _new_conversation_steps(self, deadline):
+        """new_conversation as a generator of steps, see _send_steps."""
+        if not self.driver:
+            raise Exception("Not connected. Call connect() first.")
+        yield from self._load_chat_steps("new_chat", deadline)
+        self._run_extractor("mark()")
+        self.turns = 0
+        self._count("rotations")
+
+    def _enter_text(self, input_field, message):
+        """
+        Put message into the chat input, as a generator of steps. Short
+        messages are typed TYPING_SLICE characters per step; long ones are
+        inserted with CDP Input.insertText, which fires the same input
+        events as typing, or else set through SET_INPUT_SCRIPT. Falls back to
+        typing if the input does not end up holding the whole message.
+        """
+        if self.bulk_input_threshold is not None and len(message) >= self.bulk_input_threshold:
+            # What the textarea reports as value.length: UTF-16 code units,
+            # with line breaks normalized to \n
+            expected = len(message.replace("\r\n", "\n").replace("\r", "\n").encode("utf-16-le")) // 2
+            try:
+                self.driver.execute_script(FOCUS_INPUT_SCRIPT, input_field)
+                self.driver.execute_cdp_cmd("Input.insertText", {"text": message})
+                if self.driver.execute_script(INPUT_LENGTH_SCRIPT, input_field) == expected:
+                    return
+            except Exception:
+                pass
+            try:
+                if self.driver.execute_script(SET_INPUT_SCRIPT, input_field, message) == expected:
+                    return
+            except Exception:
+                pass
+            print("Warning: Could not insert the message in one go, typing it instead.")
+        input_field.clear()
+        for start in range(0, len(message), TYPING_SLICE):
+            if start:
+                yield None
+            input_field.send_keys(message[start:start + TYPING_SLICE])
 
-    async def receive_message(self):
+    async def receive_message(self, deadline=None):
         """
         Asynchronous generator to yield complete paragraphs or list items.
         
         Yields paragraphs/list items only when:
         1. There is another paragraph/list item after it, or
         2. The entire response is complete (5 icons at the bottom)
+        
+        Stops at the "receive" timeout or the earlier grok_wait.Deadline
+        deadline of the whole request, yielding what is left of the
+        response and then raising IncompleteResponseError. Callers can
+        therefore tell a complete answer from a truncated one.
+
+        The chunks are receive_chunks rendered as markdown strings: code
+        blocks fenced with their language, other elements followed by a
+        newline.
+        """
+        async for text in markdown(self.receive_chunks(deadline)):
+            yield text
+
+    async def receive_chunks(self, deadline=None):
         """
+        Asynchronous generator to yield the response as grok_chunks.Chunk
+        objects, with the same timing as receive_message but without
+        formatting, for callers that handle code and prose separately.
+        """
+        chunks = self._receive_chunks(deadline)
+        if self.metrics is not None:
+            chunks = self._timed(chunks)
+        async for chunk in chunks:
+            yield chunk
+
+    async def _receive_chunks(self, deadline):
         if not self.driver:
             raise Exception("Not connected. Call connect() first.")
         
-        # Maximum wait time
-        max_wait_time = 120  # seconds
-        start_time = time.time()
-        response_complete = False
+        deadline = self.wait.deadline("receive", deadline)
+        started = time.monotonic()
+        
+        if self.receive_mode == "network":
+            index = 0
+            async for text in self._receive_network(deadline):
+                yield Chunk("raw", text, index, "response", started=started)
+                index += 1
+            return
         
         # Keep track of elements we've already processed
         processed_elements = set()
         
+        if self.receive_mode == "push":
+            elements = self._receive_pushed(deadline)
+        else:
+            elements = self._receive_polled(deadline)
+        
+        async for element in elements:
+            if element['id'] not in processed_elements and element['text']:
+                processed_elements.add(element['id'])
+                yield self._chunk(element, len(processed_elements) - 1, started)
+        
+        # Final check for any remaining content if we timed out
+        if deadline.expired():
+            self._count("timeouts")
+            
+            try:
+                for element in await self._call(self._run_extractor, "final()"):
+                    if element['id'] not in processed_elements and element['text']:
+                        processed_elements.add(element['id'])
+                        yield self._chunk(element, len(processed_elements) - 1, started)
+            except Exception as e:
+                print(f"Error during final elements extraction: {e}")
+            raise IncompleteResponseError("Reached maximum wait time while receiving message.")
+
+    async def _timed(self, chunks):
+        """Pass chunks through, recording the time to the first one and to the last."""
+        started = time.perf_counter()
+        first = True
+        async for chunk in chunks:
+            if first:
+                self._observe("receive_first_chunk_seconds", started)
+                first = False
+            yield chunk
+        self._observe("receive_complete_seconds", started)
+
+    async def _call(self, fn, *args):
+        """Run a blocking WebDriver call, on the session's executor if it has one."""
+        if self.browser is not None:
+            # Tabs share one driver, so switch to ours before every call
+            fn, args = self.browser.run_in_tab, (self.window_handle, fn) + args
+        if self.executor is None:
+            return fn(*args)
+        return await asyncio.get_running_loop().run_in_executor(self.executor, functools.partial(fn, *args))
+
+    async def receive_deltas(self, deadline=None):
+        """
+        Asynchronous generator to yield (element_id, appended_text) as the response grows.
+        
+        Unlike receive_message it does not wait for an element to be complete:
+        every poll yields the text added to each paragraph, list item or code
+        block since the previous one. Element ids match the ids of the
+        elements receive_message yields. In "network" mode the whole answer
+        is one element with the id "response". deadline works as in
+        receive_message, including the IncompleteResponseError.
+        """
+        deltas = self._receive_deltas(deadline)
+        if self.metrics is not None:
+            deltas = self._timed(deltas)
+        async for delta in deltas:
+            yield delta
+
+    async def _receive_deltas(self, deadline):
+        if not self.driver:
+            raise Exception("Not connected. Call connect() first.")
+        
+        deadline = self.wait.deadline("receive", deadline)
+        
+        if self.receive_mode == "network":
+            async for text in self._receive_network(deadline):
+                yield "response", text
+            return
+        
+        backoff = self.wait.backoff()
+        response_complete = False
+        while not response_complete and not deadline.expired():
+            self._count("polls")
+            try:
+                result = await self._call(self._run_extractor, "deltas()")
+            except Exception as e:
+                await self._recover(e, backoff, deadline)
+                continue
+            
+            response_complete = result['complete']
+            if result['items']:
+                backoff.event()
+            for item in result['items']:
+                yield item['id'], item['text']
+            
+            if not response_complete:
+                await self._sleep(backoff, deadline)
+        
+        if not response_complete:
+            self._count("timeouts")
+            raise IncompleteResponseError("Reached maximum wait time while receiving message.")
+
+    def _run_extractor(self, call, *args):
+        """Evaluate window.__grok.<call> in one round trip, installing the extractor if the page lost it."""
+        script = f"return window.__grok ? window.__grok.{call} : null;"
+        result = self.driver.execute_script(script, *args)
+        if result is None:
+            self._count_script(None)
+            self.driver.execute_script(EXTRACTOR_SCRIPT)
+            self._count_script(None)
+            result = self.driver.execute_script(script, *args)
+        self._count_script(result)
+        return result
+
+    async def _sleep(self, backoff, deadline):
+        """Sleep for the backoff's next delay, but not past the deadline."""
+        await asyncio.sleep(min(backoff.next(), deadline.remaining()))
+
+    async def _recover(self, error, backoff, deadline):
+        """
+        Back off after a failed round trip, or raise SessionLostError if the
+        browser no longer answers, so a dead session fails fast instead of
+        retrying until the deadline.
+        """
+        try:
+            alive = await self._call(self.is_alive)
+        except Exception:
+            alive = False
+        if not alive:
+            self._count("sessions_lost")
+            raise SessionLostError(f"Browser session was lost: {error}") from error
+        await self._sleep(backoff, deadline)
+
+    def _long_poll_ms(self, deadline):
+        """Timeout of one in-page long-poll: push_timeout, but not past the deadline."""
+        return int(min(self.push_timeout, deadline.remaining()) * 1000)
+
+    async def _receive_polled(self, deadline):
+        """Poll the extractor with backoff and yield new completed elements."""
+        backoff = self.wait.backoff()
+        response_complete = False
+        
         # Wait for the response to complete or timeout
-        while not response_complete and (time.time() - start_time) < max_wait_time:
-            # Check if response is complete (5 icons/buttons at the bottom)
+        while not response_complete and not deadline.expired():
+            self._count("polls")
             try:
-                check_complete_script = """
-                const bubbles = document.querySelectorAll('.message-bubble:not(.bg-foreground)');
-                if (bubbles.length === 0) return false;
-                
-                const lastBubbleContainer = bubbles[bubbles.length - 1].closest('.group');
-                if (!lastBubbleContainer) return false;
-                
-                // Look for the button container that appears when response is complete
-                const buttonContainer = lastBubbleContainer.querySelector('.flex.items-center.gap-\\\\[2px\\\\].w-max');
-                return buttonContainer && buttonContainer.querySelectorAll('button').length >= 5;
-                """
-                response_complete = self.driver.execute_script(check_complete_script)
+                result = await self._call(self._run_extractor, "poll()")
             except Exception as e:
-                await asyncio.sleep(0.5)
+                # If there's an error, just try again unless the browser is gone
+                await self._recover(e, backoff, deadline)
                 continue
             
-            # Get all paragraphs and list items
+            response_complete = result['complete']
+            if result['items']:
+                backoff.event()
+            for element in result['items']:
+                yield element
+            
+            # Back off while nothing happens to avoid hammering the DOM
+            if not response_complete:
+                await self._sleep(backoff, deadline)
+
+    async def _receive_pushed(self, deadline):
+        """Yield elements buffered by the in-page MutationObserver until the response is complete."""
+        await self._call(self.driver.set_script_timeout, self.push_timeout + 5)
+        backoff = self.wait.backoff()
+        installed = False
+        response_complete = False
+        
+        while not response_complete and not deadline.expired():
             try:
-                extract_elements_script = """
-                const bubbles = document.querySelectorAll('.message-bubble:not(.bg-foreground)');
-                if (bubbles.length === 0) return [];
-                
-                const latestBubble = bubbles[bubbles.length - 1];
-                
-                // Check if the response is complete (has 5 icons at the bottom)
-                const lastBubbleContainer = latestBubble.closest('.group');
-                let responseIsComplete = false;
-                
-                if (lastBubbleContainer) {
-                    const buttonContainer = lastBubbleContainer.querySelector('.flex.items-center.gap-\\\\[2px\\\\].w-max');
-                    responseIsComplete = buttonContainer && buttonContainer.querySelectorAll('button').length >= 5;
-                }
-                
-                // Use tree walking to process nodes in their natural DOM order
-                function processContentNodes(rootNode) {
-                    const results = [];
-                    let index = 0;
-                    
-                    // Function to recursively process a node and its children
-                    function processNode(node) {
-                        // Skip script and style tags
-                        if (node.tagName === 'SCRIPT' || node.tagName === 'STYLE') {
-                            return;
-                        }
-                        
-                        // Process content nodes we're interested in
-                        if (node.tagName === 'P' || node.tagName === 'LI') {
-                            let text = node.textContent.trim();
-                            
-                            // Handle ordered lists (add numbers)
-                            if (node.tagName === 'LI') {
-                                const parentList = node.closest('ol');
-                                if (parentList) {
-                                    // Get the actual list index by counting previous siblings
-                                    let number = 1;
-                                    let sibling = node.previousElementSibling;
-                                    while (sibling) {
-                                        number++;
-                                        sibling = sibling.previousElementSibling;
-                                    }
-                                    
-                                    // Apply starting index offset if specified
-                                    const startAttr = parentList.getAttribute('start');
-                                    if (startAttr) {
-                                        const start = parseInt(startAttr);
-                                        if (!isNaN(start)) {
-                                            number = start + number - 1;
-                                        }
-                                    }
-                                    
-                                    // Prepend the number to the text
-                                    text = number + ". " + text;
-                                }
-                            }
-                            
-                            // Determine if element is complete
-                            // It's complete if: 
-                            // 1. It has a next sibling of the same type (p or li), or
-                            // 2. The entire response is complete
-                            let isComplete = false;
-                            if (responseIsComplete) {
-                                isComplete = true;
-                            } else if (node.nextElementSibling && 
-                                      (node.nextElementSibling.tagName === 'P' || 
-                                       node.nextElementSibling.tagName === 'LI')) {
-                                isComplete = true;
-                            }
-                            
-                            if (text) {
-                                results.push({
-                                    id: 'text_' + index++,
-                                    text: text,
-                                    isComplete: isComplete,
-                                    type: 'text'
-                                });
-                            }
-                        } 
-                        // Handle code blocks
-                        else if (node.classList && node.classList.contains('not-prose')) {
-                            // Get language if available
-                            const langElement = node.querySelector('.font-mono');
-                            const language = langElement ? langElement.textContent.trim() : '';
-                            
-                            // Get the actual code content
-                            const codeElement = node.querySelector('code');
-                            let codeContent = '';
-                            
-                            if (codeElement) {
-                                codeContent = codeElement.textContent;
-                            } else {
-                                codeContent = node.textContent;
-                            }
-                            
-                            // Code blocks are considered complete when the response is complete
-                            results.push({
-                                id: 'code_' + index++,
-                                text: codeContent,
-                                language: language,
-                                isComplete: responseIsComplete,
-                                type: 'code'
-                            });
-                        }
-                        
-                        // Recursively process child nodes
-                        for (const child of node.children) {
-                            processNode(child);
-                        }
-                    }
-                    
-                    // Start processing from the root
-                    processNode(rootNode);
-                    return results;
-                }
-                
-                // Process the content nodes in order
-                return processContentNodes(latestBubble);
-                """
-                elements = self.driver.execute_script(extract_elements_script)
+                if not installed:
+                    installed = await self._call(self._run_extractor, "observe()")
+                    if not installed:
+                        await self._sleep(backoff, deadline)
+                        continue
                 
-                # If response is complete, mark all elements as complete
-                if response_complete:
-                    for element in elements:
-                        element['isComplete'] = True
-                
-                # Process elements that are complete and haven't been processed yet
-                for element in elements:
-                    element_id = element['id']
-                    text = element['text']
-                    is_complete = element['isComplete']
-                    element_type = element.get('type', 'text')  # Default to 'text' if type not specified
-                    
-                    if is_complete and element_id not in processed_elements and text:
-                        processed_elements.add(element_id)
-                        
-                        # Handle different element types
-                        if element_type == 'code':
-                            language = element.get('language', '')
-                            # Format code blocks with special markers
-                            code_block = f"```{language}\n{text}\n```\n"
-                            yield code_block
-                        else:
-                            # Regular text content
-                            yield text + "\n"  # Single newline - original behavior
+                self._count("polls")
+                result = await self._call(self.driver.execute_async_script, PUSH_WAIT_SCRIPT,
+                                          self._long_poll_ms(deadline))
+                self._count_script(result)
             except Exception as e:
-                # If there's an error, just continue
-                pass
+                await self._recover(e, backoff, deadline)
+                continue
             
-            # Short delay to avoid hammering the DOM
-            await asyncio.sleep(0.5)
-        
-        # Final check for any remaining content if we timed out
-        if time.time() - start_time >= max_wait_time:
-            print("Warning: Reached maximum wait time while receiving message.")
+            # The extractor or observer disappears when the page navigates
+            if not result:
+                installed = False
+                continue
+            
+            response_complete = result['complete']
+            for element in result['items']:
+                yield element
             
+            # Let other tasks run between long-polls
+            await asyncio.sleep(0)
+
+    async def _receive_network(self, deadline):
+        """Yield answer text decoded from the response stream as it arrives, until the stream ends."""
+        await self._call(self.driver.set_script_timeout, self.push_timeout + 5)
+        backoff = self.wait.backoff()
+        decoder = TokenStreamDecoder()
+        
+        while not decoder.complete and not deadline.expired():
+            self._count("polls")
             try:
-                final_extract_script = """
-                const bubbles = document.querySelectorAll('.message-bubble:not(.bg-foreground)');
-                if (bubbles.length === 0) return [];
-                
-                const latestBubble = bubbles[bubbles.length - 1];
-                
-                // Check for response completion one more time
-                const lastBubbleContainer = latestBubble.closest('.group');
-                let responseIsComplete = false;
-                
-                if (lastBubbleContainer) {
-                    const buttonContainer = lastBubbleContainer.querySelector('.flex.items-center.gap-\\\\[2px\\\\].w-max');
-                    responseIsComplete = buttonContainer && buttonContainer.querySelectorAll('button').length >= 5;
-                }
-                
-                // Use tree walking to process nodes in their natural DOM order
-                function processContentNodes(rootNode) {
-                    const results = [];
-                    let index = 0;
-                    
-                    // Function to recursively process a node and its children
-                    function processNode(node) {
-                        // Skip script and style tags
-                        if (node.tagName === 'SCRIPT' || node.tagName === 'STYLE') {
-                            return;
-                        }
-                        
-                        // Process content nodes we're interested in
-                        if (node.tagName === 'P' || node.tagName === 'LI') {
-                            let text = node.textContent.trim();
-                            
-                            // Handle ordered lists (add numbers)
-                            if (node.tagName === 'LI') {
-                                const parentList = node.closest('ol');
-                                if (parentList) {
-                                    // Get the actual list index by counting previous siblings
-                                    let number = 1;
-                                    let sibling = node.previousElementSibling;
-                                    while (sibling) {
-                                        number++;
-                                        sibling = sibling.previousElementSibling;
-                                    }
-                                    
-                                    // Apply starting index offset if specified
-                                    const startAttr = parentList.getAttribute('start');
-                                    if (startAttr) {
-                                        const start = parseInt(startAttr);
-                                        if (!isNaN(start)) {
-                                            number = start + number - 1;
-                                        }
-                                    }
-                                    
-                                    // Prepend the number to the text
-                                    text = number + ". " + text;
-                                }
-                            }
-                            
-                            // In final extraction, consider all elements complete
-                            if (text) {
-                                results.push({
-                                    id: 'text_' + index++,
-                                    text: text,
-                                    isComplete: true,
-                                    type: 'text'
-                                });
-                            }
-                        } 
-                        // Handle code blocks
-                        else if (node.classList && node.classList.contains('not-prose')) {
-                            // Get language if available
-                            const langElement = node.querySelector('.font-mono');
-                            const language = langElement ? langElement.textContent.trim() : '';
-                            
-                            // Get the actual code content
-                            const codeElement = node.querySelector('code');
-                            let codeContent = '';
-                            
-                            if (codeElement) {
-                                codeContent = codeElement.textContent;
-                            } else {
-                                codeContent = node.textContent;
-                            }
-                            
-                            results.push({
-                                id: 'code_' + index++,
-                                text: codeContent,
-                                language: language,
-                                isComplete: true,
-                                type: 'code'
-                            });
-                        }
-                        
-                        // Recursively process child nodes
-                        for (const child of node.children) {
-                            processNode(child);
-                        }
-                    }
-                    
-                    // Start processing from the root
-                    processNode(rootNode);
-                    return results;
-                }
-                
-                // Process the content nodes in order
-                return processContentNodes(latestBubble);
-                """
-                final_elements = self.driver.execute_script(final_extract_script)
-                
-                for element in final_elements:
-                    element_id = element['id']
-                    text = element['text']
-                    element_type = element.get('type', 'text')  # Default to 'text' if type not specified
-                    
-                    if element_id not in processed_elements and text:
-                        processed_elements.add(element_id)
-                        
-                        # Handle different element types
-                        if element_type == 'code':
-                            language = element.get('language', '')
-                            # Format code blocks with special markers
-                            code_block = f"```{language}\n{text}\n```\n"
-                            yield code_block
-                        else:
-                            # Regular text content
-                            yield text + "\n"  # Single newline - original behavior
+                result = await self._call(self.driver.execute_async_script, NETWORK_WAIT_SCRIPT,
+                                          self.stream_index, self._long_poll_ms(deadline))
+                self._count_script(result)
             except Exception as e:
-                print(f"Error during final elements extraction: {e}")
+                await self._recover(e, backoff, deadline)
+                continue
+            
+            if result is None:
+                raise IncompleteResponseError("Response stream was lost because the page was reloaded.")
+            
+            tokens = decoder.feed(result['text'])
+            if result['complete']:
+                tokens += decoder.close()
+            if tokens:
+                yield "".join(tokens)
+            
+            # Let other tasks run between long-polls
+            await asyncio.sleep(0)
+        
+        if not decoder.complete:
+            self._count("timeouts")
+            raise IncompleteResponseError("Reached maximum wait time while receiving message.")
+
+    @staticmethod
+    def _chunk(element, index, started):
+        """Wrap an extracted element in a Chunk."""
+        return Chunk(element.get('type', 'text'), element['text'], index, element['id'],
+                     element.get('language', ''), started)
+
+    def is_alive(self):
+        """Cheap health check: one trivial script round trip to the browser."""
+        if not self.driver:
+            return False
+        try:
+            return self.driver.execute_script("return 1;") == 1
+        except Exception:
+            return False
 
     def close(self):
-        """Close the driver."""
+        """Close the driver, or only this session's tab if the driver is shared."""
         if self.driver:
-            self.driver.quit()
-            self.driver = None
\ No newline at end of file
+            if self.browser is not None:
+                self.browser.switch_to(self.window_handle)
+                self.driver.close()
+                self.browser.active_handle = None
+            else:
+                self.driver.quit()
+            self.driver = None
+
+
+class AsyncGrokInterface:
+    """
+    Awaitable counterpart of GrokInterface.
+
+    Every WebDriver call of a session runs on one dedicated worker thread,
+    so many sessions can stream in a single asyncio process without
+    blocking the event loop or each other.
+    """
+
+    def __init__(self, interface=None, executor=None, **kwargs):
+        """
+        executor may be shared with other sessions on the same driver (see
+        GrokBrowser); by default the session gets its own worker thread.
+        """
+        self.interface = interface or GrokInterface(**kwargs)
+        self.owns_executor = executor is None
+        self.executor = executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix="grok-driver")
+        self.interface.executor = self.executor
+
+    async def connect(self, cookies=None):
+        """Initialize and connect to the chat on the session's driver thread."""
+        await self.interface._call(self.interface.connect, cookies)
+
+    async def send_message(self, message, deadline=None):
+        """
+        Send a message and wait for the response to start. Each round trip
+        is a separate call on the driver thread, and the waits in between
+        do not hold it.
+        """
+        await self.interface._run_steps_async(self.interface._send_steps(message, deadline))
+
+    async def new_conversation(self, deadline=None):
+        """Start a new chat, see GrokInterface.new_conversation."""
+        await self.interface._run_steps_async(self.interface._new_conversation_steps(deadline))
+
+    async def receive_message(self, deadline=None):
+        """Asynchronous generator yielding the response like GrokInterface.receive_message."""
+        async for chunk in self.interface.receive_message(deadline):
+            yield chunk
+
+    async def receive_chunks(self, deadline=None):
+        """Asynchronous generator yielding Chunk objects like GrokInterface.receive_chunks."""
+        async for chunk in self.interface.receive_chunks(deadline):
+            yield chunk
+
+    async def receive_deltas(self, deadline=None):
+        """Asynchronous generator yielding (element_id, appended_text) like GrokInterface.receive_deltas."""
+        async for delta in self.interface.receive_deltas(deadline):
+            yield delta
+
+    async def is_alive(self):
+        """Run GrokInterface.is_alive on the session's driver thread."""
+        return await self.interface._call(self.interface.is_alive)
+
+    async def close(self):
+        """Close the driver and stop the worker thread."""
+        try:
+            await self.interface._call(self.interface.close)
+        finally:
+            if self.owns_executor:
+                self.executor.shutdown(wait=False)
\ No newline at end of file
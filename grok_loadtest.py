@@ -0,0 +1,128 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from grok_bench import stand_in_events
+from grok_fake import FakePool, FakeSupervisor
+from grok_metrics import Metrics
+from grok_scheduler import GrokScheduler
+from grok_server import GrokServer
+
+
+async def request(host, port, body):
+    """POST one chat completion and read the whole response. Returns (status, seconds to first byte)."""
+    start = time.perf_counter()
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        data = json.dumps(body).encode()
+        writer.write(f"POST /v1/chat/completions HTTP/1.1\r\nHost: {host}\r\n"
+                     f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n\r\n".encode() + data)
+        await writer.drain()
+        status_line = await reader.readline()
+        first_byte = time.perf_counter() - start
+        await reader.read()
+        return int(status_line.split()[1]), first_byte
+    finally:
+        writer.close()
+
+
+async def client(host, port, body, results, until):
+    """Send requests one after another until the test time is up."""
+    while time.perf_counter() < until:
+        start = time.perf_counter()
+        try:
+            status, first_byte = await request(host, port, body)
+        except (ConnectionError, OSError):
+            status, first_byte = None, None
+        results.append((status, first_byte, time.perf_counter() - start))
+        if status == 429:
+            # Back off the way a client honouring Retry-After would, shortened for the test
+            await asyncio.sleep(0.1)
+
+
+async def crash(pool, interval):
+    """Kill the browser of a random session every interval seconds, busy or not."""
+    while True:
+        await asyncio.sleep(interval)
+        sessions = list(pool._sessions)
+        if sessions:
+            random.choice(sessions).interface.driver.crash()
+            pool.metrics.inc("crashes")
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))] if values else float("nan")
+
+
+async def run(args):
+    metrics = Metrics()
+    query = f"?paragraphs={args.paragraphs}&interval={args.interval}"
+    if args.standby:
+        pool = FakeSupervisor(size=args.size, standby=args.standby, probe_interval=1, respond=stand_in_events,
+                              url="fake:/" + query, latency=args.latency, metrics=metrics, rotate_after_turns=1)
+    else:
+        pool = FakePool(stand_in_events, url="fake:/" + query, size=args.size, latency=args.latency, metrics=metrics,
+                        rotate_after_turns=1)
+    await pool.start()
+    crasher = asyncio.ensure_future(crash(pool, args.crash_interval)) if args.crash_interval else None
+    scheduler = None
+    if args.scheduler:
+        scheduler = GrokScheduler(pool, max_queue=args.max_queue)
+        scheduler.start()
+    server = GrokServer(pool, max_queue=args.max_queue, scheduler=scheduler)
+    await server.start("127.0.0.1", 0)
+    port = server.server.sockets[0].getsockname()[1]
+
+    body = {"model": "grok", "stream": args.stream, "messages": [{"role": "user", "content": "load test"}]}
+    results = []
+    start = time.perf_counter()
+    await asyncio.gather(*(client("127.0.0.1", port, body, results, start + args.duration)
+                           for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - start
+    if crasher:
+        crasher.cancel()
+    await server.close()
+    if scheduler:
+        await scheduler.close()
+    await pool.close()
+
+    ok = [r for r in results if r[0] == 200]
+    latencies = [r[2] for r in ok]
+    first_bytes = [r[1] for r in ok]
+    print(f"{args.concurrency} clients, {args.size} sessions, {'stream' if args.stream else 'json'}, "
+          f"{elapsed:.1f} s")
+    print(f"  completed {len(ok)}  rejected (429) {sum(1 for r in results if r[0] == 429)}  "
+          f"failed {len(results) - len(ok) - sum(1 for r in results if r[0] == 429)}")
+    print(f"  throughput {len(ok) / elapsed:7.2f} req/s")
+    print(f"  latency    p50 {percentile(latencies, 50) * 1000:8.1f} ms  p99 {percentile(latencies, 99) * 1000:8.1f} ms")
+    print(f"  first byte p50 {percentile(first_bytes, 50) * 1000:8.1f} ms  p99 {percentile(first_bytes, 99) * 1000:8.1f} ms")
+    if args.crash_interval:
+        failover = metrics.snapshot()["histograms"].get("failover_seconds", {"count": 0, "sum": 0.0})
+        print(f"  crashes {metrics.counters.get('crashes', 0)}  failovers {failover['count']}  "
+              f"retried {metrics.counters.get('retries', 0)}  "
+              f"failover avg {failover['sum'] / failover['count'] * 1000 if failover['count'] else float('nan'):.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test grok_server.py against a pool of fake sessions.")
+    parser.add_argument("--concurrency", type=int, default=50, help="concurrent clients")
+    parser.add_argument("--duration", type=float, default=10, help="seconds to run")
+    parser.add_argument("--size", type=int, default=8, help="pool sessions")
+    parser.add_argument("--max-queue", type=int, default=16)
+    parser.add_argument("--stream", action="store_true", help="request server-sent events")
+    parser.add_argument("--scheduler", action="store_true", help="put a GrokScheduler in front of the pool")
+    parser.add_argument("--paragraphs", type=int, default=3)
+    parser.add_argument("--interval", type=int, default=50, help="milliseconds to stream one paragraph")
+    parser.add_argument("--standby", type=int, default=0, help="put a FakeSupervisor with this many standbys in charge")
+    parser.add_argument("--crash-interval", type=float, default=0,
+                        help="seconds between simulated browser crashes")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="seconds the FakeDriver adds to every WebDriver round trip")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+from grok_interface import GrokInterface, AsyncGrokInterface
+from grok_tabs import GrokBrowser, check_tab_receive_mode
+
+
+class GrokInterfacePool:
+    """
+    N warm AsyncGrokInterface sessions behind a concurrency-limited async API.
+
+    Sessions share one set of cookies, are leased one per request and
+    returned afterwards. A session whose request failed is health checked
+    on return and replaced in the background if its browser is gone.
+
+    With tabs_per_browser > 1 the sessions are tabs of shared GrokBrowser
+    processes instead of one Chrome process each, which only works with
+    the "poll" receive mode.
+
+    A metrics interface argument is shared by all sessions, and the pool
+    records its lease wait times in it as well.
+    """
+
+    def __init__(self, size=2, parallel_start=True, tabs_per_browser=1, **interface_kwargs):
+        if tabs_per_browser > 1:
+            check_tab_receive_mode(interface_kwargs.get("receive_mode", "poll"))
+        self.size = size
+        self.parallel_start = parallel_start
+        self.tabs_per_browser = tabs_per_browser
+        self.interface_kwargs = interface_kwargs
+        self.metrics = interface_kwargs.get("metrics")
+        self.cookies = None
+        self.browsers = []
+        # Leased first-in first-out so every session stays warm
+        self._idle = deque()
+        # Counts idle sessions, so acquiring it is what limits concurrency
+        self._available = asyncio.Semaphore(0)
+        self._sessions = set()
+        self._waiting = 0
+        self._lease_count = 0
+        self._lease_wait_total = 0.0
+        self._lease_wait_max = 0.0
+        self._recycled = 0
+        self._closed = False
+
+    async def start(self):
+        """Load cookies once and connect all sessions."""
+        self.cookies = GrokInterface(**self.interface_kwargs)._load_cookies()
+        if self.tabs_per_browser > 1:
+            self.browsers = [GrokBrowser(**self.interface_kwargs)
+                             for _ in range(-(-self.size // self.tabs_per_browser))]
+            # Tabs of one browser open one after another on its worker
+            # thread, the first one starting Chrome; browsers start in parallel
+            starters = [self._start_session(self.browsers[i // self.tabs_per_browser])
+                        for i in range(self.size)]
+        else:
+            starters = [self._start_session() for _ in range(self.size)]
+        if self.parallel_start:
+            results = await asyncio.gather(*starters, return_exceptions=True)
+        else:
+            results = []
+            for starter in starters:
+                try:
+                    results.append(await starter)
+                except Exception as e:
+                    results.append(e)
+        failures = [r for r in results if isinstance(r, Exception)]
+        if len(failures) == self.size:
+            raise failures[0]
+        for failure in failures:
+            print(f"Warning: Failed to start a pool session: {failure}")
+
+    async def _connect(self, browser=None):
+        """A newly connected session, in a tab of browser if one is given, not yet in the pool."""
+        if browser is not None:
+            return await browser.open_tab(self.cookies)
+        session = AsyncGrokInterface(**self.interface_kwargs)
+        try:
+            await session.connect(self.cookies)
+        except Exception:
+            await session.close()
+            raise
+        return session
+
+    async def _start_session(self, browser=None):
+        session = await self._connect(browser)
+        self._add(session)
+        return session
+
+    def _add(self, session):
+        self._sessions.add(session)
+        self._release_idle(session)
+
+    def _release_idle(self, session):
+        self._idle.append(session)
+        self._available.release()
+
+    async def acquire(self, deadline=None):
+        """
+        Wait for an idle session and lease it. With a grok_wait.Deadline,
+        raises asyncio.TimeoutError if none becomes idle before it.
+        """
+        if self._closed:
+            raise Exception("Pool is closed.")
+        start = time.perf_counter()
+        self._waiting += 1
+        try:
+            if deadline is None:
+                await self._available.acquire()
+            else:
+                await asyncio.wait_for(self._available.acquire(), deadline.remaining())
+        except asyncio.TimeoutError:
+            if self.metrics is not None:
+                self.metrics.inc("timeouts")
+            raise
+        finally:
+            self._waiting -= 1
+        waited = time.perf_counter() - start
+        self._lease_count += 1
+        self._lease_wait_total += waited
+        self._lease_wait_max = max(self._lease_wait_max, waited)
+        if self.metrics is not None:
+            self.metrics.observe("pool_lease_wait_seconds", waited)
+        return self._idle.popleft()
+
+    async def release(self, session, failed=False):
+        """Return a leased session; failed sessions are health checked first."""
+        if self._closed:
+            await session.close()
+            return
+        if failed and not await session.is_alive():
+            asyncio.ensure_future(self._recycle(session))
+            return
+        self._release_idle(session)
+
+    async def _recycle(self, session):
+        """Replace a dead session with a freshly connected one."""
+        self._sessions.discard(session)
+        self._recycled += 1
+        try:
+            await session.close()
+        except Exception:
+            pass
+        await self._replace(session)
+
+    async def _replace(self, session):
+        """Start a session in place of a recycled one."""
+        # A dead tab is replaced by a new tab while its browser still runs
+        browser = session.interface.browser
+        if browser is not None and not await browser.is_alive():
+            browser = None
+        try:
+            await self._start_session(browser)
+        except Exception as e:
+            print(f"Warning: Failed to replace a pool session: {e}")
+
+    async def check_health(self):
+        """Health check every idle session and recycle the dead ones."""
+        for _ in range(len(self._idle)):
+            # Stop early if requests have leased every session meanwhile
+            if self._available.locked():
+                break
+            await self._available.acquire()
+            await self.release(self._idle.popleft(), failed=True)
+
+    @asynccontextmanager
+    async def lease(self, deadline=None, session=None):
+        """
+        Async context manager that leases a session for the duration of the
+        block, or takes over session if it was acquired already.
+        """
+        if session is None:
+            session = await self.acquire(deadline)
+        failed = False
+        try:
+            yield session
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            await self.release(session, failed=failed)
+
+    async def ask(self, message, deadline=None, session=None):
+        """
+        Send a message on a leased session and yield the response chunks.
+        deadline, a grok_wait.Deadline, bounds the wait for a session and
+        every step of the request. session is an already acquired session
+        to use instead of leasing one; it is released all the same.
+        """
+        async with self.lease(deadline, session) as session:
+            await session.send_message(message, deadline)
+            async for chunk in session.receive_message(deadline):
+                yield chunk
+
+    def stats(self):
+        """Snapshot of pool occupancy, queue depth and lease wait times (seconds)."""
+        return {
+            "size": len(self._sessions),
+            "idle": len(self._idle),
+            "in_use": len(self._sessions) - len(self._idle),
+            "queue_depth": self._waiting,
+            "leases": self._lease_count,
+            "lease_wait_avg": self._lease_wait_total / self._lease_count if self._lease_count else 0.0,
+            "lease_wait_max": self._lease_wait_max,
+            "recycled": self._recycled,
+        }
+
+    async def close(self):
+        """Close every session, including ones still leased when they come back."""
+        self._closed = True
+        # Tabs go away with their browser below
+        sessions = [session for session in self._idle if session.interface.browser is None]
+        self._idle = deque()
+        await asyncio.gather(*(session.close() for session in sessions), return_exceptions=True)
+        await asyncio.gather(*(browser.close() for browser in self.browsers), return_exceptions=True)
+        self._sessions.clear()
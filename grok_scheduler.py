@@ -0,0 +1,215 @@
+import asyncio
+import itertools
+import time
+from collections import OrderedDict, deque
+
+# Priority classes, most urgent first
+PRIORITIES = {"interactive": 0, "default": 1, "bulk": 2}
+
+
+class QueueFullError(Exception):
+    """The scheduler's queue is full and the request was not admitted, or was shed for a more urgent one."""
+
+
+class _Ticket:
+    """One queued request waiting to be handed a session."""
+
+    __slots__ = ("priority", "tenant", "deadline", "future", "queued_at", "order")
+
+    def __init__(self, priority, tenant, deadline, order):
+        self.priority = priority
+        self.tenant = tenant
+        self.deadline = deadline
+        self.future = asyncio.get_running_loop().create_future()
+        self.queued_at = time.perf_counter()
+        self.order = order
+
+
+class GrokScheduler:
+    """
+    Decides which waiting request gets the next free session of a pool.
+
+    Requests are served by priority class first ("interactive" before
+    "default" before "bulk"), and within a class round robin between
+    tenants, so one tenant's burst cannot starve the others. Requests whose
+    deadline passes while they wait are dropped before they reach a
+    browser. At most max_queue requests wait; beyond that a new request is
+    rejected with QueueFullError, unless it is more urgent than the least
+    urgent waiting request, which is then shed instead.
+
+    A request handed a session runs through the pool's ask, so a
+    GrokSupervisor retries it on another session if the first one is lost.
+    """
+
+    def __init__(self, pool, max_queue=64, metrics=None):
+        self.pool = pool
+        self.max_queue = max_queue
+        self.metrics = metrics if metrics is not None else pool.metrics
+        # priority -> tenant -> deque of tickets, tenants in round robin order
+        self._queues = {priority: OrderedDict() for priority in PRIORITIES.values()}
+        self._queued = 0
+        self._order = itertools.count()
+        # Set while requests are queued
+        self._work = asyncio.Event()
+        self._dispatcher = None
+        # Why dispatching stopped, if the pool failed
+        self._error = None
+        self._counts = {"dispatched": 0, "expired": 0, "rejected": 0, "shed": 0}
+
+    def start(self):
+        """Start dispatching; the pool must be started."""
+        self._dispatcher = asyncio.ensure_future(self._dispatch())
+
+    async def close(self):
+        """Stop dispatching and fail every waiting request."""
+        if self._dispatcher:
+            self._dispatcher.cancel()
+            try:
+                await self._dispatcher
+            except asyncio.CancelledError:
+                pass
+            self._dispatcher = None
+        self._fail_waiting(Exception("Scheduler is closed."))
+
+    def _fail_waiting(self, error):
+        """Fail every waiting request with error, except those whose deadline passed."""
+        ticket = self._next_ticket()
+        while ticket is not None:
+            ticket.future.set_exception(error)
+            ticket = self._next_ticket()
+
+    def _count(self, name):
+        self._counts[name] += 1
+        if self.metrics is not None:
+            self.metrics.inc(f"scheduler_{name}")
+
+    def _enqueue(self, ticket):
+        if self._error is not None:
+            raise Exception(f"Scheduler stopped: {self._error}") from self._error
+        if self._queued >= self.max_queue:
+            victim = self._least_urgent()
+            if victim is None or victim.priority <= ticket.priority:
+                self._count("rejected")
+                raise QueueFullError("Request queue is full.")
+            self._remove(victim)
+            victim.future.set_exception(QueueFullError("Request was shed for a more urgent one."))
+            self._count("shed")
+        self._queues[ticket.priority].setdefault(ticket.tenant, deque()).append(ticket)
+        self._queued += 1
+        self._work.set()
+
+    def _least_urgent(self):
+        """The most recently queued ticket of the least urgent non-empty class."""
+        for priority in sorted(self._queues, reverse=True):
+            tickets = [tickets[-1] for tickets in self._queues[priority].values() if tickets]
+            if tickets:
+                return max(tickets, key=lambda ticket: ticket.order)
+        return None
+
+    def _remove(self, ticket):
+        tenants = self._queues[ticket.priority]
+        tickets = tenants.get(ticket.tenant)
+        if tickets and ticket in tickets:
+            tickets.remove(ticket)
+            self._dequeued()
+            if not tickets:
+                del tenants[ticket.tenant]
+
+    def _dequeued(self):
+        self._queued -= 1
+        if not self._queued:
+            self._work.clear()
+
+    def _next_ticket(self):
+        """Pop the next ticket to serve, dropping expired and abandoned ones on the way."""
+        for priority in sorted(self._queues):
+            tenants = self._queues[priority]
+            while tenants:
+                tenant, tickets = next(iter(tenants.items()))
+                ticket = tickets.popleft()
+                self._dequeued()
+                # Move the tenant to the back of the round robin
+                del tenants[tenant]
+                if tickets:
+                    tenants[tenant] = tickets
+                if ticket.future.done():
+                    continue
+                if ticket.deadline is not None and ticket.deadline.expired():
+                    ticket.future.set_exception(asyncio.TimeoutError())
+                    self._count("expired")
+                    continue
+                return ticket
+        return None
+
+    async def _dispatch(self):
+        while True:
+            # Lease a session only once a request is waiting for it
+            await self._work.wait()
+            try:
+                session = await self.pool.acquire()
+            except Exception as e:
+                # The pool is gone; fail what is waiting and every later request
+                self._error = e
+                self._fail_waiting(e)
+                return
+            ticket = self._next_ticket()
+            if ticket is None:
+                # Every waiting request expired or gave up meanwhile
+                await self.pool.release(session)
+                continue
+            ticket.future.set_result(session)
+            self._count("dispatched")
+            if self.metrics is not None:
+                self.metrics.observe("scheduler_queue_wait_seconds", time.perf_counter() - ticket.queued_at)
+
+    async def ask(self, message, priority="default", tenant="default", deadline=None):
+        """
+        Asynchronous generator yielding the response chunks once the
+        scheduler hands the request a session. priority is a PRIORITIES name
+        or number and deadline a grok_wait.Deadline; an expired request
+        raises asyncio.TimeoutError without being sent.
+        """
+        priority = PRIORITIES.get(priority, priority)
+        if priority not in self._queues:
+            raise ValueError(f"Unknown priority: {priority}")
+        ticket = _Ticket(priority, tenant, deadline, next(self._order))
+        self._enqueue(ticket)
+        try:
+            if deadline is None:
+                session = await ticket.future
+            else:
+                session = await asyncio.wait_for(asyncio.shield(ticket.future), deadline.remaining())
+        except BaseException:
+            self._remove(ticket)
+            if ticket.future.done() and not ticket.future.cancelled() and ticket.future.exception() is None:
+                # Handed a session just as we gave up
+                await self.pool.release(ticket.future.result())
+            elif not ticket.future.done():
+                ticket.future.cancel()
+                if deadline is not None and deadline.expired():
+                    self._count("expired")
+            raise
+
+        # The pool releases the session, and a supervisor retries lost ones
+        chunks = self.pool.ask(message, deadline, session)
+        try:
+            started = time.perf_counter()
+            first = True
+            async for chunk in chunks:
+                if first:
+                    first = False
+                    if self.metrics is not None:
+                        self.metrics.observe("scheduler_dispatch_seconds", time.perf_counter() - started)
+                yield chunk
+        finally:
+            await chunks.aclose()
+
+    def stats(self):
+        """Waiting requests per priority class plus dispatch, expiry, rejection and shedding counts."""
+        names = {number: name for name, number in PRIORITIES.items()}
+        return dict(
+            queued=self._queued,
+            **{f"queued_{names.get(priority, priority)}": sum(len(tickets) for tickets in tenants.values())
+               for priority, tenants in self._queues.items()},
+            **self._counts,
+        )
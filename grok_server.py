@@ -0,0 +1,334 @@
+import argparse
+import asyncio
+import json
+import math
+import time
+import uuid
+
+from grok_interface import IncompleteResponseError
+from grok_metrics import Metrics
+from grok_pool import GrokInterfacePool
+from grok_scheduler import GrokScheduler, PRIORITIES, QueueFullError
+from grok_supervisor import GrokSupervisor
+from grok_wait import Deadline
+
+MAX_HEADER_BYTES = 64 * 1024
+MAX_BODY_BYTES = 10 * 2**20
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 429: "Too Many Requests", 500: "Internal Server Error",
+           504: "Gateway Timeout"}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+def messages_to_prompt(messages):
+    """
+    Turn OpenAI chat messages into one prompt. Every request is sent in a
+    new Grok conversation, so the conversation so far travels in the prompt.
+    """
+    if not isinstance(messages, list) or not messages:
+        raise HTTPError(400, "'messages' must be a non-empty list.")
+    turns = []
+    for message in messages:
+        content = message.get("content") if isinstance(message, dict) else None
+        if isinstance(content, list):
+            # Content parts; only text is supported
+            content = "\n".join(part.get("text", "") for part in content if isinstance(part, dict))
+        if not isinstance(content, str):
+            raise HTTPError(400, "Every message needs text 'content'.")
+        turns.append((message.get("role", "user"), content))
+    if len(turns) == 1 and turns[0][0] == "user":
+        return turns[0][1]
+    return "\n\n".join(f"{role.capitalize()}: {content}" for role, content in turns)
+
+
+class GrokServer:
+    """
+    OpenAI-compatible HTTP server in front of a GrokInterfacePool.
+
+    Serves POST /v1/chat/completions, streaming the response as
+    server-sent events when the request sets "stream": true, plus
+    GET /v1/models, GET /health with the pool stats and GET /metrics when
+    the pool has a Metrics instance. Requests beyond max_queue waiting for
+    a session are turned away with 429 and a Retry-After header.
+
+    With a GrokScheduler, requests go through it instead: the request's
+    "user" field is the tenant, the X-Priority header its priority class,
+    and the scheduler's queue limit applies.
+
+    Sessions are shared between clients, and Grok remembers what was said
+    in a conversation, so the pool must start a new conversation for every
+    request (rotate_after_turns=1). Otherwise answers would depend on other
+    clients' prompts, and the history would grow without bound.
+    """
+
+    def __init__(self, pool, max_queue=16, request_timeout=180, model="grok", scheduler=None):
+        if pool.interface_kwargs.get("rotate_after_turns") != 1:
+            raise ValueError("The pool must start a new conversation per request: pass rotate_after_turns=1.")
+        self.pool = pool
+        self.scheduler = scheduler
+        self.max_queue = max_queue
+        self.request_timeout = request_timeout
+        self.model = model
+        self.server = None
+        # Requests admitted to the pool that have not finished yet
+        self._active = 0
+
+    async def start(self, host="127.0.0.1", port=8000):
+        self.server = await asyncio.start_server(self._handle, host, port, limit=MAX_HEADER_BYTES)
+        return self.server
+
+    async def close(self):
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+
+    async def _read_request(self, reader):
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        try:
+            method, path, _ = request_line.decode("latin-1").split(" ", 2)
+        except ValueError:
+            raise HTTPError(400, "Malformed request line.")
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get("content-length", 0) or 0)
+        except ValueError:
+            raise HTTPError(400, "Invalid Content-Length.")
+        if length < 0:
+            raise HTTPError(400, "Invalid Content-Length.")
+        if length > MAX_BODY_BYTES:
+            raise HTTPError(413, "Request body too large.")
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), path.split("?", 1)[0], headers, body
+
+    async def _handle(self, reader, writer):
+        try:
+            try:
+                request = await self._read_request(reader)
+                if request is None:
+                    return
+                await self._route(writer, *request)
+            except HTTPError as e:
+                await self._send_error(writer, e.status, str(e), e.headers)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                pass
+            except Exception as e:
+                await self._send_error(writer, 500, f"{type(e).__name__}: {e}")
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, writer, method, path, headers, body):
+        if path == "/v1/chat/completions":
+            if method != "POST":
+                raise HTTPError(405, "Use POST.")
+            try:
+                request = json.loads(body or b"{}")
+            except ValueError:
+                raise HTTPError(400, "Request body is not valid JSON.")
+            if not isinstance(request, dict):
+                raise HTTPError(400, "Request body must be a JSON object.")
+            await self._chat_completions(writer, request, headers)
+        elif path == "/v1/models" and method == "GET":
+            await self._send_json(writer, 200, {
+                "object": "list",
+                "data": [{"id": self.model, "object": "model", "created": 0, "owned_by": "grok"}],
+            })
+        elif path == "/health" and method == "GET":
+            await self._send_json(writer, 200, self.pool.stats())
+        elif path == "/metrics" and method == "GET" and self.pool.metrics is not None:
+            await self._send(writer, 200, self.pool.metrics.to_prometheus().encode(),
+                             {"Content-Type": "text/plain; version=0.0.4"})
+        else:
+            raise HTTPError(404, f"No route for {method} {path}.")
+
+    def _busy(self, message="All sessions are busy, try again later."):
+        retry_after = max(1, math.ceil(self.pool.stats()["lease_wait_avg"]))
+        return HTTPError(429, message, {"Retry-After": str(retry_after)})
+
+    def _admit(self):
+        """
+        Refuse the request with 429 if max_queue requests are already
+        waiting for a session. Counts the server's own unfinished requests,
+        since a burst of them is admitted before any reaches the pool's queue.
+        """
+        size = self.pool.stats()["size"]
+        if size == 0 or self._active >= size + self.max_queue:
+            raise self._busy()
+        self._active += 1
+
+    async def _chat_completions(self, writer, request, headers):
+        prompt = messages_to_prompt(request.get("messages"))
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        model = request.get("model") or self.model
+        deadline = Deadline(self.request_timeout)
+        if self.scheduler is not None:
+            priority = headers.get("x-priority", "default")
+            if priority not in PRIORITIES:
+                raise HTTPError(400, f"X-Priority must be one of {', '.join(PRIORITIES)}.")
+            chunks = self.scheduler.ask(prompt, priority, str(request.get("user") or "default"), deadline)
+        else:
+            self._admit()
+            chunks = self.pool.ask(prompt, deadline)
+        admitted = self.scheduler is None
+        try:
+            if request.get("stream"):
+                await self._stream(writer, chunks, completion_id, created, model)
+            else:
+                parts = []
+                # A response cut off by the deadline is returned as far as it got
+                finish_reason = "stop"
+                try:
+                    async for chunk in chunks:
+                        parts.append(chunk)
+                except IncompleteResponseError:
+                    finish_reason = "length"
+                except asyncio.TimeoutError:
+                    raise HTTPError(504, "Timed out waiting for a session.")
+                except QueueFullError as e:
+                    raise self._busy(str(e))
+                await self._send_json(writer, 200, {
+                    "id": completion_id,
+                    "object": "chat.completion",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(parts)},
+                                 "finish_reason": finish_reason}],
+                })
+        finally:
+            try:
+                await chunks.aclose()
+            finally:
+                if admitted:
+                    self._active -= 1
+
+    async def _stream(self, writer, chunks, completion_id, created, model):
+        def event(delta, finish_reason=None):
+            data = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            return f"data: {json.dumps(data)}\n\n".encode()
+
+        # Wait for the first chunk before committing to a 200, so a request
+        # that never got a session can still fail with a proper status
+        finish_reason = "stop"
+        try:
+            first = await chunks.__anext__()
+        except StopAsyncIteration:
+            first = None
+        except IncompleteResponseError:
+            first, finish_reason = None, "length"
+        except asyncio.TimeoutError:
+            raise HTTPError(504, "Timed out waiting for a session.")
+        except QueueFullError as e:
+            raise self._busy(str(e))
+
+        writer.write(self._head(200, {"Content-Type": "text/event-stream", "Cache-Control": "no-cache"}))
+        writer.write(event({"role": "assistant", "content": ""}))
+        try:
+            if first is not None:
+                writer.write(event({"content": first}))
+                await writer.drain()
+                async for chunk in chunks:
+                    writer.write(event({"content": chunk}))
+                    # Backpressure: a slow client holds its own stream, not the loop
+                    await writer.drain()
+            writer.write(event({}, finish_reason))
+        except IncompleteResponseError:
+            writer.write(event({}, "length"))
+        except ConnectionError:
+            raise
+        except Exception as e:
+            writer.write(f"data: {json.dumps({'error': {'message': str(e), 'type': 'server_error'}})}\n\n".encode())
+        writer.write(b"data: [DONE]\n\n")
+        await writer.drain()
+
+    @staticmethod
+    def _head(status, headers):
+        lines = [f"HTTP/1.1 {status} {REASONS.get(status, '')}", "Connection: close"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+    async def _send(self, writer, status, body, headers):
+        writer.write(self._head(status, dict(headers, **{"Content-Length": str(len(body))})))
+        writer.write(body)
+        await writer.drain()
+
+    async def _send_json(self, writer, status, data, headers=None):
+        await self._send(writer, status, json.dumps(data).encode(), dict({"Content-Type": "application/json"}, **(headers or {})))
+
+    async def _send_error(self, writer, status, message, headers=None):
+        error_type = "rate_limit_error" if status == 429 else "invalid_request_error" if status < 500 else "server_error"
+        await self._send_json(writer, status, {"error": {"message": message, "type": error_type}}, headers)
+
+
+async def serve(args):
+    options = dict(size=args.size, tabs_per_browser=args.tabs_per_browser, metrics=Metrics(), interactive=False,
+                   receive_mode=args.receive_mode, driver_options={"headless": args.headless},
+                   rotate_after_turns=1)
+    if args.standby:
+        pool = GrokSupervisor(standby=args.standby, probe_interval=args.probe_interval, **options)
+    else:
+        pool = GrokInterfacePool(**options)
+    await pool.start()
+    scheduler = None
+    if args.scheduler:
+        scheduler = GrokScheduler(pool, max_queue=args.max_queue)
+        scheduler.start()
+    server = GrokServer(pool, max_queue=args.max_queue, request_timeout=args.timeout, scheduler=scheduler)
+    await server.start(args.host, args.port)
+    print(f"Serving on http://{args.host}:{args.port}/v1/chat/completions")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.close()
+        if scheduler:
+            await scheduler.close()
+        await pool.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI-compatible HTTP API backed by a pool of Grok sessions.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--size", type=int, default=2, help="warm sessions")
+    parser.add_argument("--tabs-per-browser", type=int, default=1)
+    parser.add_argument("--receive-mode", default="poll", choices=["poll", "push", "network"])
+    parser.add_argument("--max-queue", type=int, default=16, help="requests that may wait for a session before 429")
+    parser.add_argument("--timeout", type=float, default=180, help="seconds allowed per request")
+    parser.add_argument("--headless", action="store_true")
+    parser.add_argument("--standby", type=int, default=0,
+                        help="connected spare sessions that replace a crashed one at once")
+    parser.add_argument("--probe-interval", type=float, default=10, help="seconds between liveness probes")
+    parser.add_argument("--scheduler", action="store_true",
+                        help="schedule requests by X-Priority class and fairly between users")
+    args = parser.parse_args()
+    if args.tabs_per_browser > 1 and args.receive_mode != "poll":
+        parser.error("--tabs-per-browser needs --receive-mode poll")
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
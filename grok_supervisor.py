@@ -0,0 +1,201 @@
+import asyncio
+import time
+from collections import deque
+
+from grok_interface import CaptchaError, SessionLostError
+from grok_pool import GrokInterfacePool
+
+
+class GrokSupervisor(GrokInterfacePool):
+    """
+    GrokInterfacePool with hot standby sessions and liveness probes.
+
+    Besides the size sessions that serve requests, standby sessions are
+    kept connected and idle, each in its own Chrome process. Every
+    probe_interval seconds each idle and standby session is pinged with a
+    one round trip script. A session found dead, or whose request failed
+    because its browser died or showed a CAPTCHA, is swapped for a standby
+    at once while a new standby connects in the background; with no
+    standby left it is replaced the slow way, as in the pool.
+
+    ask() retries a request on another session, at most retries times,
+    when its session was lost before any of the answer was yielded, so
+    callers never see a partial or repeated answer.
+
+    With metrics, failover_seconds records the time from detecting a lost
+    session to its replacement being in service, next to the failovers,
+    retries, probe_failures and standby_failures counters. Sessions are
+    not interactive unless interactive=True is passed: a CAPTCHA raises
+    CaptchaError instead of waiting on stdin.
+    """
+
+    def __init__(self, size=2, standby=1, probe_interval=10.0, probe_timeout=5.0, retries=1, **kwargs):
+        kwargs.setdefault("interactive", False)
+        super().__init__(size=size, **kwargs)
+        self.standby = standby
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+        self.retries = retries
+        self._standby = deque()
+        self._starting = 0
+        self._prober = None
+        self._failovers = 0
+        self._retried = 0
+
+    async def start(self):
+        """Connect the serving sessions and the standbys, then start probing."""
+        await super().start()
+        await asyncio.gather(*(self._start_standby() for _ in range(self.standby)))
+        if self.probe_interval:
+            self._prober = asyncio.ensure_future(self._probe_loop())
+
+    def _count(self, name):
+        if self.metrics is not None:
+            self.metrics.inc(name)
+
+    async def _start_standby(self):
+        self._starting += 1
+        try:
+            session = await self._connect()
+        except Exception as e:
+            self._count("standby_failures")
+            print(f"Warning: Failed to start a standby session: {e}")
+            return
+        finally:
+            self._starting -= 1
+        if self._closed:
+            await self._close(session)
+        else:
+            self._standby.append(session)
+
+    def _refill(self):
+        """Start standbys in the background until there are enough."""
+        for _ in range(self.standby - len(self._standby) - self._starting):
+            asyncio.ensure_future(self._start_standby())
+
+    async def _ping(self, session):
+        """Whether the session's browser answers a trivial script within probe_timeout."""
+        try:
+            return await asyncio.wait_for(session.is_alive(), self.probe_timeout)
+        except Exception:
+            return False
+
+    async def _close(self, session):
+        # A hung browser must not hold up the caller
+        try:
+            await asyncio.wait_for(session.close(), self.probe_timeout)
+        except Exception:
+            pass
+
+    async def _recycle(self, session):
+        """Swap a lost session for a standby, or replace it the slow way if none is ready."""
+        detected = time.perf_counter()
+        if self._standby:
+            self._sessions.discard(session)
+            self._recycled += 1
+            self._add(self._standby.popleft())
+            asyncio.ensure_future(self._close(session))
+            self._refill()
+        else:
+            await super()._recycle(session)
+        self._failovers += 1
+        self._count("failovers")
+        if self.metrics is not None:
+            self.metrics.observe("failover_seconds", time.perf_counter() - detected)
+
+    async def _probe_loop(self):
+        while True:
+            await asyncio.sleep(self.probe_interval)
+            await self.probe()
+
+    async def probe(self):
+        """Ping every standby and idle session, replacing the ones that do not answer."""
+        if self._closed:
+            return
+        for session in list(self._standby):
+            if not await self._ping(session) and session in self._standby:
+                self._standby.remove(session)
+                self._count("probe_failures")
+                asyncio.ensure_future(self._close(session))
+        self._refill()
+        for _ in range(len(self._idle)):
+            # Stop early if requests have leased every session meanwhile
+            if self._available.locked() or self._closed:
+                break
+            await self._available.acquire()
+            session = self._idle.popleft()
+            if await self._ping(session):
+                self._release_idle(session)
+            else:
+                self._count("probe_failures")
+                asyncio.ensure_future(self._recycle(session))
+
+    async def release(self, session, failed=False):
+        """Return a leased session; a failed one that does not answer is swapped for a standby."""
+        if self._closed or not failed:
+            await super().release(session)
+        elif await self._ping(session):
+            self._release_idle(session)
+        else:
+            asyncio.ensure_future(self._recycle(session))
+
+    async def ask(self, message, deadline=None, session=None):
+        """
+        Send a message on a leased session and yield the response chunks,
+        like GrokInterfacePool.ask, retrying on another session if the
+        first one is lost before the answer starts. Retries lease their
+        session straight from the pool, even if session was handed out by
+        a GrokScheduler.
+        """
+        attempt = 0
+        while True:
+            if session is None:
+                session = await self.acquire(deadline)
+            yielded = False
+            try:
+                await session.send_message(message, deadline)
+                async for chunk in session.receive_message(deadline):
+                    yielded = True
+                    yield chunk
+            except Exception as e:
+                lost = isinstance(e, (SessionLostError, CaptchaError)) or not await self._ping(session)
+                if lost and not self._closed:
+                    asyncio.ensure_future(self._recycle(session))
+                else:
+                    await self.release(session)
+                if (not lost or yielded or attempt >= self.retries
+                        or (deadline is not None and deadline.expired())):
+                    raise
+                attempt += 1
+                self._retried += 1
+                self._count("retries")
+                session = None
+                continue
+            except BaseException:
+                await self.release(session, failed=True)
+                raise
+            await self.release(session)
+            return
+
+    def stats(self):
+        """Pool stats plus standby sessions, failovers and retried requests."""
+        return dict(
+            super().stats(),
+            standby=len(self._standby),
+            standby_starting=self._starting,
+            failovers=self._failovers,
+            retries=self._retried,
+        )
+
+    async def close(self):
+        """Stop probing and close every session and standby."""
+        if self._prober:
+            self._prober.cancel()
+            try:
+                await self._prober
+            except asyncio.CancelledError:
+                pass
+            self._prober = None
+        standby, self._standby = list(self._standby), deque()
+        await super().close()
+        await asyncio.gather(*(self._close(session) for session in standby))
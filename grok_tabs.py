@@ -0,0 +1,104 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from grok_interface import GrokInterface, AsyncGrokInterface
+
+
+def check_tab_receive_mode(receive_mode):
+    """Raise ValueError unless sessions in tabs of one browser can use receive_mode."""
+    if receive_mode != "poll":
+        raise ValueError(f"Tabs sharing a browser need receive_mode \"poll\", not {receive_mode!r}: "
+                         "a long-poll would hold the shared driver.")
+
+
+class GrokBrowser:
+    """
+    One Chrome process hosting several conversations, one per tab.
+
+    Every tab is an AsyncGrokInterface session. All tabs share the driver and
+    a single worker thread, and each call made through a tab switches to
+    that tab's window first. The shared thread means calls of different tabs
+    run one after another, so sending and receiving are split into short
+    calls, and only the "poll" receive mode is allowed: a "push" or
+    "network" long-poll would hold the driver for the whole wait.
+    """
+
+    def __init__(self, **interface_kwargs):
+        check_tab_receive_mode(interface_kwargs.get("receive_mode", "poll"))
+        self.interface_kwargs = interface_kwargs
+        self.driver = None
+        self.active_handle = None
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="grok-browser")
+        self.sessions = []
+        # Held while the first tab starts Chrome
+        self._starting = asyncio.Lock()
+
+    def switch_to(self, handle):
+        """Make handle the driver's current window unless it already is."""
+        if self.active_handle != handle:
+            self.driver.switch_to.window(handle)
+            self.active_handle = handle
+
+    def run_in_tab(self, handle, fn, *args):
+        """Run a blocking WebDriver call against the tab with the given window handle."""
+        if handle is not None:
+            self.switch_to(handle)
+        return fn(*args)
+
+    def _start(self, cookies):
+        """Start Chrome with the conversation of the first tab."""
+        interface = GrokInterface(**self.interface_kwargs)
+        interface.driver_options["background_tabs"] = True
+        interface.connect(cookies)
+        self.driver = interface.driver
+        interface.window_handle = self.active_handle = self.driver.current_window_handle
+        interface.browser = self
+        return interface
+
+    async def open_tab(self, cookies=None):
+        """
+        Open a conversation in a new tab and return its session. The first
+        tab starts Chrome; later ones load while the other tabs keep working.
+        """
+        async with self._starting:
+            if self.driver is None:
+                interface = await asyncio.get_running_loop().run_in_executor(self.executor, self._start, cookies)
+                session = AsyncGrokInterface(interface, executor=self.executor)
+                self.sessions.append(session)
+                return session
+        interface = GrokInterface(**self.interface_kwargs)
+        interface.browser = self
+        session = AsyncGrokInterface(interface, executor=self.executor)
+        await interface._run_steps_async(interface._connect_tab_steps(self.driver))
+        self.sessions.append(session)
+        return session
+
+    async def start(self, tabs, cookies=None):
+        """Open the given number of tabs and return their sessions."""
+        return [await self.open_tab(cookies) for _ in range(tabs)]
+
+    def _is_alive(self):
+        if not self.driver:
+            return False
+        try:
+            self.driver.window_handles
+            return True
+        except Exception:
+            return False
+
+    async def is_alive(self):
+        """Whether the browser process still answers."""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self._is_alive)
+
+    async def close(self):
+        """Quit Chrome, closing every tab, and stop the worker thread."""
+        if self.driver:
+            driver, self.driver = self.driver, None
+            for session in self.sessions:
+                session.interface.driver = None
+            try:
+                await asyncio.get_running_loop().run_in_executor(self.executor, driver.quit)
+            except Exception:
+                pass
+        self.sessions = []
+        self.executor.shutdown(wait=False)
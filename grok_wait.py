@@ -0,0 +1,136 @@
+import asyncio
+import time
+
+from selenium.common.exceptions import NoSuchElementException, StaleElementReferenceException, TimeoutException
+
+# Seconds allowed for each operation unless a WaitStrategy overrides them
+DEFAULT_TIMEOUTS = {
+    "captcha": 5,          # CAPTCHA or chat input appearing after the page load
+    "chat_load": 10,       # chat input appearing after a solved CAPTCHA
+    "tab_load": 20,        # chat input appearing in a new tab
+    "new_chat": 20,        # chat input appearing after starting a new conversation
+    "input": 20,           # chat input being present before sending
+    "submit": 20,          # Submit button becoming clickable
+    "response_start": 20,  # response bubble appearing after submit
+    "receive": 120,        # whole response being received
+}
+
+
+class Deadline:
+    """A point in time on the monotonic clock, unaffected by wall-clock changes."""
+
+    def __init__(self, seconds):
+        self.expires = time.monotonic() + seconds
+
+    @classmethod
+    def earliest(cls, seconds, deadline=None):
+        """A deadline seconds from now, or deadline if that comes first."""
+        own = cls(seconds)
+        if deadline is not None and deadline.expires < own.expires:
+            return deadline
+        return own
+
+    def remaining(self):
+        return max(0.0, self.expires - time.monotonic())
+
+    def expired(self):
+        return time.monotonic() >= self.expires
+
+
+class Backoff:
+    """
+    Delays between polls for an event stream.
+
+    Polls start fast and back off exponentially while nothing happens.
+    event() marks that a poll found something: the delay drops back to
+    initial, and the average gap between events is used to sleep through
+    the quiet part of the next gap and poll fast around when the next event
+    is expected.
+    """
+
+    def __init__(self, initial=0.1, maximum=1.0, factor=2.0, smoothing=0.3):
+        self.initial = initial
+        self.maximum = maximum
+        self.factor = factor
+        self.smoothing = smoothing
+        self.delay = initial
+        self.gap = None
+        self.last_event = None
+
+    def event(self):
+        now = time.monotonic()
+        if self.last_event is not None:
+            gap = now - self.last_event
+            self.gap = gap if self.gap is None else self.gap + self.smoothing * (gap - self.gap)
+        self.last_event = now
+        self.delay = self.initial
+
+    def next(self):
+        """Seconds to sleep before the next poll."""
+        if self.gap is not None:
+            until_expected = self.last_event + self.gap - time.monotonic()
+            if until_expected > self.delay:
+                return min(until_expected, self.maximum)
+        delay = self.delay
+        self.delay = min(self.delay * self.factor, self.maximum)
+        return delay
+
+
+class WaitStrategy:
+    """
+    How GrokInterface waits: per-operation timeouts and poll backoff.
+
+    timeouts overrides entries of DEFAULT_TIMEOUTS. initial, maximum and
+    factor configure the Backoff of every poll loop.
+    """
+
+    def __init__(self, initial=0.1, maximum=1.0, factor=2.0, timeouts=None):
+        self.initial = initial
+        self.maximum = maximum
+        self.factor = factor
+        self.timeouts = dict(DEFAULT_TIMEOUTS, **(timeouts or {}))
+
+    def backoff(self):
+        return Backoff(self.initial, self.maximum, self.factor)
+
+    def deadline(self, operation, deadline=None):
+        """Deadline of an operation, capped by the caller's deadline of the whole request."""
+        return Deadline.earliest(self.timeouts[operation], deadline)
+
+    def until(self, driver, condition, operation, deadline=None):
+        """
+        Blocking counterpart of WebDriverWait.until with backoff between
+        checks. Returns the first truthy value of condition(driver) and
+        raises TimeoutException once the operation's deadline passes.
+        """
+        deadline = self.deadline(operation, deadline)
+        backoff = self.backoff()
+        while True:
+            try:
+                value = condition(driver)
+                if value:
+                    return value
+            except (NoSuchElementException, StaleElementReferenceException):
+                pass
+            if deadline.expired():
+                raise TimeoutException(f"Timed out waiting for {operation}.")
+            time.sleep(min(backoff.next(), deadline.remaining()))
+
+    async def until_async(self, check, condition, operation, deadline=None):
+        """
+        Awaitable counterpart of until for drivers shared between tasks:
+        each check is await check(condition), e.g. run on the driver's
+        worker thread, and the backoff sleeps without blocking the loop.
+        """
+        deadline = self.deadline(operation, deadline)
+        backoff = self.backoff()
+        while True:
+            try:
+                value = await check(condition)
+                if value:
+                    return value
+            except (NoSuchElementException, StaleElementReferenceException):
+                pass
+            if deadline.expired():
+                raise TimeoutException(f"Timed out waiting for {operation}.")
+            await asyncio.sleep(min(backoff.next(), deadline.remaining()))
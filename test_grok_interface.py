@@ -0,0 +1,451 @@
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from grok_bench import response_events
+from grok_cache import ResponseCache
+from grok_chat import drop_partial_line, read_checkpoint, read_results
+from grok_fake import FakeDriver, FakePool, FakeSupervisor
+from grok_interface import (GrokInterface, AsyncGrokInterface, IncompleteResponseError, CHAT_URL, COOKIE_FILE,
+                            PROFILE_MARKER)
+from grok_metrics import Metrics
+from grok_pool import GrokInterfacePool
+from grok_scheduler import GrokScheduler
+from grok_server import GrokServer
+from grok_wait import Deadline, WaitStrategy
+
+
+def answer(paragraphs=3, interval=50, words=5):
+    """respond callback for a FakeDriver: paragraphs streamed over interval milliseconds each."""
+    def respond(query, message):
+        return response_events(paragraphs, interval, words=words)
+    return respond
+
+
+def expected_words(paragraphs=3, words=5):
+    return "".join(token["result"]["response"]["token"]
+                   for _, token in response_events(paragraphs, 0, words=words)).split()
+
+
+def fake_session(respond, executor=None, **kwargs):
+    """An AsyncGrokInterface connected to a FakeDriver instead of Chrome."""
+    interface = GrokInterface(**kwargs)
+    interface.driver = FakeDriver(respond)
+    return AsyncGrokInterface(interface, executor=executor)
+
+
+async def timed_answer(session, message="hi"):
+    """Send message and return (time.monotonic(), chunk) for every chunk of the answer."""
+    await session.send_message(message)
+    return [(time.monotonic(), chunk) async for chunk in session.receive_message()]
+
+
+def test_sessions_stream_in_parallel():
+    async def run():
+        sessions = [fake_session(answer(paragraphs=5, interval=100)) for _ in range(2)]
+        try:
+            started = time.monotonic()
+            results = await asyncio.gather(*(timed_answer(session) for session in sessions))
+            return time.monotonic() - started, results
+        finally:
+            for session in sessions:
+                await session.close()
+
+    elapsed, results = asyncio.run(run())
+    assert [len(chunks) for chunks in results] == [5, 5]
+    # Each answer takes about 0.5 s; one after the other would take twice that
+    assert elapsed < 0.8
+    # Ordered by arrival, the chunks of the two sessions alternate
+    order = [i for _, i in sorted((at, i) for i, chunks in enumerate(results) for at, _ in chunks)]
+    switches = sum(1 for a, b in zip(order, order[1:]) if a != b)
+    assert switches >= 4
+
+
+@pytest.mark.parametrize("receive_mode", ["poll", "push", "network"])
+def test_receive_modes_agree(receive_mode):
+    async def run():
+        session = fake_session(answer(), receive_mode=receive_mode, push_timeout=1)
+        try:
+            return [chunk for _, chunk in await timed_answer(session)]
+        finally:
+            await session.close()
+
+    chunks = asyncio.run(run())
+    assert chunks
+    assert "".join(chunks).split() == expected_words()
+
+
+def test_receive_deltas_add_up_to_the_answer():
+    async def run():
+        session = fake_session(answer())
+        try:
+            await session.send_message("hi")
+            return [delta async for delta in session.receive_deltas()]
+        finally:
+            await session.close()
+
+    deltas = asyncio.run(run())
+    texts = {}
+    for element_id, text in deltas:
+        texts[element_id] = texts.get(element_id, "") + text
+    assert len(texts) == 3
+    assert " ".join(texts.values()).split() == expected_words()
+
+
+def test_pool_leases_and_releases_sessions():
+    async def run():
+        pool = FakePool(answer(), size=2)
+        await pool.start()
+        try:
+            first = await pool.acquire()
+            second = await pool.acquire()
+            assert first is not second
+            assert pool.stats()["idle"] == 0
+            with pytest.raises(asyncio.TimeoutError):
+                await pool.acquire(Deadline(0.1))
+            await pool.release(first)
+            assert await pool.acquire(Deadline(0.1)) is first
+            await pool.release(first)
+            await pool.release(second)
+
+            async with pool.lease() as session:
+                assert pool.stats()["in_use"] == 1
+            assert pool.stats()["in_use"] == 0
+            assert session in (first, second)
+
+            text = "".join([chunk async for chunk in pool.ask("hi")])
+            stats = pool.stats()
+        finally:
+            await pool.close()
+        return text, stats
+
+    text, stats = asyncio.run(run())
+    assert text.split() == expected_words()
+    assert stats["leases"] == 5
+    assert stats["idle"] == 2
+
+
+def test_pool_recycles_dead_sessions():
+    async def run():
+        pool = FakePool(answer(), size=1)
+        await pool.start()
+        try:
+            session = await pool.acquire()
+            session.interface.driver.crash()
+            await pool.release(session, failed=True)
+            replacement = await pool.acquire(Deadline(1))
+            await pool.release(replacement)
+            return session, replacement, pool.stats()
+        finally:
+            await pool.close()
+
+    session, replacement, stats = asyncio.run(run())
+    assert replacement is not session
+    assert stats["recycled"] == 1
+
+
+def test_failed_connect_forgets_a_warm_profile(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    profile = tmp_path / "profile"
+    profile.mkdir()
+    marker = profile / PROFILE_MARKER
+    marker.write_text("{}")
+    driver = FakeDriver(answer())
+    driver.crash()
+    monkeypatch.setattr(GrokInterface, "_setup_driver", lambda self, **options: driver)
+
+    interface = GrokInterface(driver_options={"profile_dir": str(profile)}, interactive=False)
+    assert interface._profile_is_warm(str(marker))
+    with pytest.raises(Exception):
+        interface.connect()
+    assert not marker.exists()
+
+
+def test_newer_cookie_file_overrides_a_warm_profile(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    marker = tmp_path / PROFILE_MARKER
+    marker.write_text("{}")
+    cookies = tmp_path / COOKIE_FILE
+    cookies.write_text("[]")
+    os.utime(marker, (time.time() - 60, time.time() - 60))
+    assert not GrokInterface._profile_is_warm(str(marker))
+    os.utime(marker, (time.time() + 60, time.time() + 60))
+    assert GrokInterface._profile_is_warm(str(marker))
+
+
+def test_send_on_a_shared_thread_does_not_stall_other_tabs():
+    async def run():
+        executor = ThreadPoolExecutor(max_workers=1)
+        streaming = fake_session(answer(paragraphs=10, interval=100), executor=executor)
+        typing = fake_session(answer(), executor=executor)
+        typing.interface.driver.key_delay = 0.002
+        try:
+            async def send_later():
+                await asyncio.sleep(0.2)
+                # 500 typed characters take 1 s on this driver
+                await typing.send_message("x" * 500)
+
+            started = time.monotonic()
+            chunks, _ = await asyncio.gather(timed_answer(streaming), send_later())
+            return [started] + [at for at, _ in chunks]
+        finally:
+            executor.shutdown(wait=False)
+
+    arrivals = asyncio.run(run())
+    assert len(arrivals) == 11
+    assert max(b - a for a, b in zip(arrivals, arrivals[1:])) < 0.5
+
+
+def test_tabs_need_poll_mode():
+    with pytest.raises(ValueError):
+        GrokInterfacePool(tabs_per_browser=2, receive_mode="push")
+    GrokInterfacePool(tabs_per_browser=2)
+
+
+def test_resumed_batch_drops_a_partial_last_line(tmp_path):
+    out = tmp_path / "out.jsonl"
+    out.write_text(json.dumps({"id": "1", "response": "one"}) + "\n" + '{"id": "2", "resp')
+    assert read_checkpoint(str(out)) == {"1"}
+    drop_partial_line(str(out))
+    with open(out, "a") as f:
+        f.write(json.dumps({"id": "3", "response": "three"}) + "\n")
+    assert read_checkpoint(str(out)) == {"1", "3"}
+
+    drop_partial_line(str(out))
+    assert read_checkpoint(str(out)) == {"1", "3"}
+
+
+def test_rotating_every_turn_starts_each_prompt_in_a_new_conversation():
+    async def run():
+        metrics = Metrics()
+        pool = FakePool(answer(), size=1, rotate_after_turns=1, metrics=metrics)
+        await pool.start()
+        try:
+            for prompt in ("first", "second", "third"):
+                assert "".join([chunk async for chunk in pool.ask(prompt)]).split() == expected_words()
+            session = await pool.acquire()
+            await pool.release(session)
+            return session.interface.turns, metrics.counters.get("rotations", 0)
+        finally:
+            await pool.close()
+
+    assert asyncio.run(run()) == (1, 2)
+
+
+@pytest.mark.parametrize("receive_mode", ["poll", "push", "network"])
+def test_truncated_response_raises(receive_mode):
+    async def run():
+        session = fake_session(answer(paragraphs=10, interval=100), receive_mode=receive_mode, push_timeout=0.2,
+                               wait=WaitStrategy(timeouts={"receive": 0.35}))
+        chunks = []
+        try:
+            await session.send_message("hi")
+            with pytest.raises(IncompleteResponseError):
+                async for chunk in session.receive_message():
+                    chunks.append(chunk)
+        finally:
+            await session.close()
+        return chunks
+
+    chunks = asyncio.run(run())
+    assert 0 < len("".join(chunks).split()) < len(expected_words(paragraphs=10))
+
+
+def test_cache_stores_only_complete_responses(tmp_path):
+    async def run():
+        pool = FakePool(answer(paragraphs=10, interval=100), size=1, rotate_after_turns=1,
+                        wait=WaitStrategy(timeouts={"receive": 0.3}))
+        cache = ResponseCache(str(tmp_path / "cache.sqlite3"))
+        await pool.start()
+        try:
+            for _ in range(2):
+                with pytest.raises(IncompleteResponseError):
+                    async for _ in cache.ask(pool.ask, "hi"):
+                        pass
+            truncated = cache.stats()
+
+            pool.interface_kwargs["wait"].timeouts["receive"] = 10
+            first = [chunk async for chunk in cache.ask(pool.ask, "hi")]
+            second = [chunk async for chunk in cache.ask(pool.ask, "hi")]
+            return truncated, first, second, cache.stats()
+        finally:
+            await pool.close()
+            cache.close()
+
+    truncated, first, second, stats = asyncio.run(run())
+    assert truncated["misses"] == 2 and truncated["entries"] == 0
+    assert first == second
+    assert "".join(first).split() == expected_words(paragraphs=10)
+    assert stats["hits"] == 1 and stats["entries"] == 1
+
+
+def test_server_refuses_pools_that_keep_conversations():
+    with pytest.raises(ValueError):
+        GrokServer(FakePool(answer()))
+    GrokServer(FakePool(answer(), rotate_after_turns=1))
+
+
+def test_fake_driver_keeps_its_script_across_new_conversations():
+    driver = FakeDriver(lambda query, message: [])
+    driver.get("fake:/?paragraphs=2")
+    driver.get(CHAT_URL)
+    assert driver.query == {"paragraphs": "2"}
+
+
+def test_scheduler_leases_one_session_per_request():
+    async def run():
+        pool = FakePool(answer(interval=10), size=2, rotate_after_turns=1)
+        await pool.start()
+        scheduler = GrokScheduler(pool)
+        scheduler.start()
+        try:
+            async def ask(prompt):
+                return "".join([chunk async for chunk in scheduler.ask(prompt)])
+
+            texts = await asyncio.gather(*(ask(f"prompt {i}") for i in range(5)))
+            await asyncio.sleep(0.05)
+            return texts, pool.stats(), scheduler.stats()
+        finally:
+            await scheduler.close()
+            await pool.close()
+
+    texts, pool_stats, scheduler_stats = asyncio.run(run())
+    assert all(text.split() == expected_words() for text in texts)
+    assert pool_stats["leases"] == 5
+    assert scheduler_stats["dispatched"] == 5
+
+
+def test_scheduler_fails_fast_once_the_pool_is_gone():
+    async def run():
+        pool = FakePool(answer(), size=1, rotate_after_turns=1)
+        await pool.start()
+        scheduler = GrokScheduler(pool)
+        scheduler.start()
+        await pool.close()
+        try:
+            for _ in range(2):
+                with pytest.raises(Exception, match="closed"):
+                    await asyncio.wait_for(scheduler.ask("hi").__anext__(), 1)
+            return scheduler._dispatcher
+        finally:
+            await scheduler.close()
+
+    dispatcher = asyncio.run(run())
+    assert dispatcher.done() and dispatcher.exception() is None
+
+
+def test_scheduled_requests_keep_the_supervisor_retry():
+    async def run():
+        pool = FakeSupervisor(size=1, standby=1, probe_interval=0, respond=answer(), rotate_after_turns=1)
+        await pool.start()
+        scheduler = GrokScheduler(pool)
+        scheduler.start()
+        try:
+            next(iter(pool._sessions)).interface.driver.crash()
+            text = "".join([chunk async for chunk in scheduler.ask("hi")])
+            return text, pool.stats()
+        finally:
+            await scheduler.close()
+            await pool.close()
+
+    text, stats = asyncio.run(run())
+    assert text.split() == expected_words()
+    assert stats["retries"] == 1
+    assert stats["failovers"] == 1
+
+
+async def http(port, head, body=b""):
+    """Send a raw HTTP request to a local server and return (status, response body)."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        writer.write(head.encode() + b"\r\n\r\n" + body)
+        await writer.drain()
+        response = await reader.read()
+    finally:
+        writer.close()
+    status_line, _, rest = response.partition(b"\r\n")
+    return int(status_line.split()[1]), rest.partition(b"\r\n\r\n")[2]
+
+
+@pytest.mark.parametrize("length", ["abc", "-5"])
+def test_server_rejects_an_invalid_content_length(length):
+    async def run():
+        pool = FakePool(answer(), size=1, rotate_after_turns=1)
+        await pool.start()
+        server = GrokServer(pool)
+        await server.start("127.0.0.1", 0)
+        try:
+            port = server.server.sockets[0].getsockname()[1]
+            return await http(port, f"POST /v1/chat/completions HTTP/1.1\r\nContent-Length: {length}")
+        finally:
+            await server.close()
+            await pool.close()
+
+    status, body = asyncio.run(run())
+    assert status == 400
+    assert json.loads(body)["error"]["message"] == "Invalid Content-Length."
+
+
+def test_server_rejects_a_burst_beyond_the_queue_limit():
+    async def run():
+        pool = FakePool(answer(paragraphs=3, interval=100), size=1, rotate_after_turns=1)
+        await pool.start()
+        server = GrokServer(pool, max_queue=2)
+        await server.start("127.0.0.1", 0)
+        try:
+            port = server.server.sockets[0].getsockname()[1]
+            body = json.dumps({"messages": [{"role": "user", "content": "hi"}]}).encode()
+            head = f"POST /v1/chat/completions HTTP/1.1\r\nContent-Length: {len(body)}"
+            results = await asyncio.gather(*(http(port, head, body) for _ in range(12)))
+            return [status for status, _ in results], server._active
+        finally:
+            await server.close()
+            await pool.close()
+
+    statuses, active = asyncio.run(run())
+    # One request on the session plus max_queue waiting ones
+    assert statuses.count(200) == 3
+    assert statuses.count(429) == 9
+    assert active == 0
+
+
+def test_the_last_batch_record_of_an_id_wins(tmp_path):
+    out = tmp_path / "out.jsonl"
+    out.write_text("".join(json.dumps(record) + "\n" for record in [
+        {"id": "1", "error": "timed out"},
+        {"id": "2", "response": "two"},
+        {"id": "1", "response": "one"},
+        {"id": "3", "error": "timed out"},
+    ]))
+    results = read_results(str(out))
+    assert results["1"] == {"id": "1", "response": "one"}
+    assert read_checkpoint(str(out)) == {"1", "2"}
+
+
+def test_new_conversation_on_a_shared_thread_does_not_stall_other_tabs():
+    async def run():
+        executor = ThreadPoolExecutor(max_workers=1)
+        streaming = fake_session(answer(paragraphs=10, interval=100), executor=executor)
+        rotating = fake_session(answer(), executor=executor, rotate_after_turns=1)
+        # Every page load of this tab takes 1 s
+        rotating.interface.driver.load_delay = 1.0
+        rotating.interface.turns = 1
+        try:
+            async def send_later():
+                await asyncio.sleep(0.2)
+                await rotating.send_message("hi")
+
+            started = time.monotonic()
+            chunks, _ = await asyncio.gather(timed_answer(streaming), send_later())
+            return [started] + [at for at, _ in chunks], rotating.interface.turns
+        finally:
+            executor.shutdown(wait=False)
+
+    arrivals, turns = asyncio.run(run())
+    assert turns == 1
+    assert len(arrivals) == 11
+    assert max(b - a for a, b in zip(arrivals, arrivals[1:])) < 0.5